@@ -1,21 +1,83 @@
 """Service functions for game effects (immunity, double chance)."""
 import calendar
 import logging
+from bisect import bisect_right
 from collections import Counter
+from collections.abc import Sequence
 from datetime import date, datetime
-from typing import List, Optional, Set, Tuple
+from itertools import accumulate, repeat
+from typing import Iterator, List, Optional, Set, Tuple, Union
 from unittest.mock import MagicMock
 
-from sqlmodel import select
+from sqlmodel import select, update
 
 from bot.app.models import TGUser, GamePlayerEffect
-from bot.handlers.game.shop_service import get_or_create_player_effects
+from bot.handlers.game.shop_service import get_or_create_player_effects, get_or_create_players_effects
 from bot.utils import to_date
 
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
 
+class SelectionPool(Sequence):
+    """
+    Пул выбора без копий игроков: игрок с весом w занимает w подряд идущих позиций.
+
+    Ведёт себя как список с повторами (len, индексация и срезы, итерация,
+    in, index, count), поэтому random.choice(pool) даёт то же распределение,
+    но память не растёт экспоненциально от числа покупок двойного шанса.
+    Поиск (in, index, count) идёт по игрокам, а не по развёрнутым позициям.
+    """
+
+    def __init__(self, players: List[TGUser], weights: List[int]):
+        self.players = players
+        self.weights = weights
+        self._bounds = list(accumulate(weights))
+
+    def __len__(self) -> int:
+        return self._bounds[-1] if self._bounds else 0
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TGUser, List[TGUser]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("selection pool index out of range")
+        return self.players[bisect_right(self._bounds, index)]
+
+    def __iter__(self) -> Iterator[TGUser]:
+        for player, weight in zip(self.players, self.weights):
+            yield from repeat(player, weight)
+
+    def __contains__(self, player) -> bool:
+        return any(p == player for p, weight in zip(self.players, self.weights) if weight > 0)
+
+    def index(self, player, start: int = 0, stop: Optional[int] = None) -> int:
+        if start < 0:
+            start = max(len(self) + start, 0)
+        if stop is None:
+            stop = len(self)
+        elif stop < 0:
+            stop += len(self)
+        position = 0
+        for p, weight in zip(self.players, self.weights):
+            # Первая позиция игрока внутри [start, stop)
+            first = max(position, start)
+            if p == player and first < min(position + weight, stop):
+                return first
+            position += weight
+        raise ValueError(f"{player!r} is not in selection pool")
+
+    def count(self, player: TGUser) -> int:
+        return sum(weight for p, weight in zip(self.players, self.weights) if p == player)
+
+
+def _is_immune(effect: GamePlayerEffect, current_year: int, current_day: int) -> bool:
+    """Защита активна, если год и день защиты совпадают с текущими."""
+    return effect.immunity_year == current_year and effect.immunity_day == current_day
+
+
 def filter_protected_players(
     db_session,
     game_id: int,
@@ -23,26 +85,25 @@ def filter_protected_players(
     current_date: date
 ) -> Tuple[List[TGUser], List[TGUser]]:
     """Разделить игроков на защищённых и незащищённых."""
-    protected_players = []
-    unprotected_players = []
+    # В последний день года защита не работает — эффекты можно не загружать
+    if not is_immunity_enabled(current_date):
+        return players, []
 
     current_year = current_date.year
     current_day = current_date.timetuple().tm_yday
 
-    for player in players:
-        effect = get_or_create_player_effects(db_session, game_id, player.id)
-
-        # Проверяем защиту: активна если год и день совпадают с текущими
-        is_protected = (effect.immunity_year == current_year and effect.immunity_day == current_day)
-
-        if is_protected:
-            protected_players.append(player)
-            logger.debug(f"Player {player.id} is protected on {current_year}-{current_day}")
-        else:
-            unprotected_players.append(player)
+    # Загружаем эффекты всех игроков одним запросом
+    effects = get_or_create_players_effects(db_session, game_id, [player.id for player in players])
 
-        db_session.add(effect)
+    protected_ids = {
+        player.id for player in players
+        if _is_immune(effects[player.id], current_year, current_day)
+    }
+    protected_players = [player for player in players if player.id in protected_ids]
+    unprotected_players = [player for player in players if player.id not in protected_ids]
 
+    if protected_ids:
+        logger.debug(f"Players {sorted(protected_ids)} are protected on {current_year}-{current_day}")
     logger.info(f"Filtered players: {len(unprotected_players)} unprotected, {len(protected_players)} protected")
     return unprotected_players, protected_players
 
@@ -76,11 +137,11 @@ def build_selection_pool(
     players: List[TGUser],
     current_date: date,
     birthday_multiplier: int = 1,
-) -> Tuple[List[TGUser], Set[int], Set[int]]:
+) -> Tuple[SelectionPool, Set[int], Set[int]]:
     """
     Создать пул выбора с учётом двойного шанса и бонуса именинника.
 
-    Игроки с активным двойным шансом добавляются в пул экспоненциально:
+    Игроки с активным двойным шансом получают вес экспоненциально:
     1 покупка = 2^1 = 2 записи, 2 покупки = 2^2 = 4 записи, и т.д.
 
     Если у игрока сегодня день рождения, его количество записей домножается
@@ -88,16 +149,17 @@ def build_selection_pool(
     """
     from bot.app.models import DoubleChancePurchase
 
-    selection_pool = []
+    weights = []
     players_with_double_chance = set()
     players_with_birthday = set()
 
     current_year = current_date.year
     current_day = current_date.timetuple().tm_yday
 
-    # Получаем все активные покупки двойного шанса на сегодня
+    # Получаем активные покупки двойного шанса на сегодня для всех игроков одним запросом
     stmt = select(DoubleChancePurchase).where(
         DoubleChancePurchase.game_id == game_id,
+        DoubleChancePurchase.target_id.in_([player.id for player in players]),
         DoubleChancePurchase.year == current_year,
         DoubleChancePurchase.day == current_day,
         DoubleChancePurchase.is_used == False
@@ -111,13 +173,12 @@ def build_selection_pool(
         purchase_count = purchase_counts.get(player.id, 0)
         has_birthday = birthday_multiplier > 1 and is_player_birthday(player, current_date)
 
-        entries_count = (2 ** purchase_count) if purchase_count > 0 else 1
+        entries_count = 1 << purchase_count
         if has_birthday:
             entries_count *= birthday_multiplier
             players_with_birthday.add(player.id)
 
-        for _ in range(entries_count):
-            selection_pool.append(player)
+        weights.append(entries_count)
 
         if purchase_count > 0:
             players_with_double_chance.add(player.id)
@@ -128,6 +189,8 @@ def build_selection_pool(
                 f"(double_chance={purchase_count}, birthday={has_birthday})"
             )
 
+    selection_pool = SelectionPool(players, weights)
+
     logger.info(
         f"Built selection pool: {len(selection_pool)} entries, "
         f"{len(players_with_double_chance)} with double chance, "
@@ -148,14 +211,15 @@ def check_winner_immunity(
         immunity_buyer_id если защищён (может совпадать с winner.id при самозащите),
         None если не защищён.
     """
+    if not is_immunity_enabled(current_date):
+        return None
+
     winner_effect = get_or_create_player_effects(db_session, game_id, winner.id)
 
     current_year = current_date.year
     current_day = current_date.timetuple().tm_yday
 
-    is_protected = (winner_effect.immunity_year == current_year and winner_effect.immunity_day == current_day)
-
-    if is_protected:
+    if _is_immune(winner_effect, current_year, current_day):
         logger.info(f"Winner {winner.id} ({winner.full_username()}) is protected on {current_year}-{current_day}")
         db_session.add(winner_effect)
         # Если buyer_id не заполнен (старые записи до фичи), считаем самозащитой
@@ -181,30 +245,28 @@ def reset_double_chance(
     current_year = current_date.year
     current_day = current_date.timetuple().tm_yday
 
-    # Находим все активные покупки двойного шанса для этого игрока на сегодня
-    stmt = select(DoubleChancePurchase).where(
+    # Помечаем все активные покупки двойного шанса для этого игрока на сегодня одним UPDATE
+    stmt = update(DoubleChancePurchase).where(
         DoubleChancePurchase.game_id == game_id,
         DoubleChancePurchase.target_id == user_id,
         DoubleChancePurchase.year == current_year,
         DoubleChancePurchase.day == current_day,
         DoubleChancePurchase.is_used == False
-    )
-    purchases = db_session.exec(stmt).all()
+    ).values(is_used=True)
+    result = db_session.exec(stmt)
 
-    for purchase in purchases:
-        logger.info(f"Marking double chance purchase {purchase.id} as used for user {user_id}")
-        purchase.is_used = True
-        db_session.add(purchase)
+    logger.info(f"Marked {result.rowcount} double chance purchases as used for user {user_id}")
 
 
-def is_immunity_enabled(current_datetime: datetime) -> bool:
+def is_immunity_enabled(current_datetime: date | datetime) -> bool:
     """
     Проверить, включена ли защита (не последний день года).
 
     В последний день года (31 декабря) защита не работает.
+    Сравниваются только month/day, поэтому подходят и date, и datetime.
 
     Args:
-        current_datetime: Текущая дата и время
+        current_datetime: Текущая дата (date или datetime)
 
     Returns:
         True если защита включена, False если последний день года
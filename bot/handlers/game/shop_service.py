@@ -3,7 +3,8 @@ import logging
 from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional
 
-from sqlmodel import select
+from sqlalchemy import event
+from sqlmodel import Session, select
 
 from bot.app.models import GamePlayerEffect, Prediction, PidorCoinTransaction
 from bot.utils import to_date
@@ -45,6 +46,24 @@ def calculate_next_day(current_date: date, year: int) -> tuple[int, int]:
         return year, next_day
 
 
+def _player_effects_cache(db_session) -> Dict[tuple[int, int], GamePlayerEffect]:
+    """
+    Кэш эффектов игроков в рамках сессии БД: (game_id, user_id) -> GamePlayerEffect.
+
+    Сессия открывается на каждый апдейт, поэтому кэш живёт ровно один запрос.
+    Закэшированные объекты — те же экземпляры из identity map сессии, так что
+    изменения защиты/множителя видны без инвалидации. После rollback() кэш
+    сбрасывается (см. _reset_player_effects_cache).
+    """
+    return db_session.info.setdefault('player_effects', {})
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _reset_player_effects_cache(session, previous_transaction) -> None:
+    """Сбросить кэш эффектов после отката: в нём могут остаться откаченные или просроченные объекты."""
+    session.info.pop('player_effects', None)
+
+
 def get_or_create_player_effects(db_session, game_id: int, user_id: int) -> GamePlayerEffect:
     """
     Получить или создать запись эффектов игрока в конкретной игре.
@@ -57,6 +76,10 @@ def get_or_create_player_effects(db_session, game_id: int, user_id: int) -> Game
     Returns:
         Запись GamePlayerEffect для игрока в игре
     """
+    cache = _player_effects_cache(db_session)
+    if (game_id, user_id) in cache:
+        return cache[(game_id, user_id)]
+
     stmt = select(GamePlayerEffect).where(
         GamePlayerEffect.game_id == game_id,
         GamePlayerEffect.user_id == user_id
@@ -75,9 +98,51 @@ def get_or_create_player_effects(db_session, game_id: int, user_id: int) -> Game
         db_session.refresh(effect)
         logger.info(f"Created new player effects for user {user_id} in game {game_id}")
 
+    cache[(game_id, user_id)] = effect
     return effect
 
 
+def get_or_create_players_effects(db_session, game_id: int, user_ids: List[int]) -> Dict[int, GamePlayerEffect]:
+    """
+    Получить или создать записи эффектов сразу для нескольких игроков одним запросом.
+
+    Args:
+        db_session: Сессия базы данных
+        game_id: ID игры (чата)
+        user_ids: ID пользователей
+
+    Returns:
+        Словарь user_id -> GamePlayerEffect для всех переданных пользователей
+    """
+    cache = _player_effects_cache(db_session)
+    effects = {user_id: cache[(game_id, user_id)] for user_id in user_ids if (game_id, user_id) in cache}
+    uncached_ids = [user_id for user_id in user_ids if user_id not in effects]
+    if not uncached_ids:
+        return effects
+
+    stmt = select(GamePlayerEffect).where(
+        GamePlayerEffect.game_id == game_id,
+        GamePlayerEffect.user_id.in_(uncached_ids)
+    )
+
+    effects.update((effect.user_id, effect) for effect in db_session.exec(stmt).all())
+
+    missing_effects = [
+        GamePlayerEffect(game_id=game_id, user_id=user_id, next_win_multiplier=1)
+        for user_id in uncached_ids
+        if user_id not in effects
+    ]
+    if missing_effects:
+        db_session.add_all(missing_effects)
+        db_session.flush()
+        for effect in missing_effects:
+            effects[effect.user_id] = effect
+        logger.info(f"Created new player effects for {len(missing_effects)} users in game {game_id}")
+
+    cache.update(((game_id, user_id), effects[user_id]) for user_id in uncached_ids)
+    return effects
+
+
 def spend_coins(db_session, game_id: int, user_id: int, amount: int, year: int, reason: str, auto_commit: bool = True) -> PidorCoinTransaction:
     """
     Списать койны у пользователя (создать отрицательную транзакцию).
@@ -0,0 +1,31 @@
+"""add_double_chance_day_index
+
+Revision ID: q2r3s4t5u6v7
+Revises: p1q2r3s4t5u6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'q2r3s4t5u6v7'
+down_revision = 'p1q2r3s4t5u6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Все выборки двойного шанса идут по (game_id, year, day) и target_id:
+    # пул выбора, сброс после победы, проверки в магазине.
+    # Уникальный ключ (game_id, buyer_id, year, day) для них не подходит.
+    op.create_index(
+        'ix_doublechancepurchase_game_day_target',
+        'doublechancepurchase',
+        ['game_id', 'year', 'day', 'target_id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_doublechancepurchase_game_day_target', table_name='doublechancepurchase')
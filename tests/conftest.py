@@ -2,8 +2,17 @@
 Общие фикстуры для тестирования игровых команд
 """
 import pytest
+from collections import deque
+from dataclasses import dataclass, field
 from unittest.mock import MagicMock, Mock, AsyncMock
 from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+import bot.app.models  # noqa: F401 - регистрирует таблицы в SQLModel.metadata
 
 
 @pytest.fixture
@@ -22,6 +31,143 @@ def mock_db_session():
     return session
 
 
+class FakeResult:
+    """Результат exec() из FakeSession: first()/all() по заранее заданным строкам"""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self.rowcount = len(rows)
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def all(self):
+        return self._rows
+
+
+class FakeQuery:
+    """Заглушка db_session.query(Model): цепочка filter_by/order_by всегда приводит к одному значению"""
+    __slots__ = ('_value',)
+
+    def __init__(self, value):
+        self._value = value
+
+    def filter_by(self, **_):
+        return self
+
+    def order_by(self, *_):
+        return self
+
+    def one(self):
+        return self._value
+
+    def one_or_none(self):
+        return self._value
+
+    def first(self):
+        return self._value
+
+    def all(self):
+        return self._value
+
+
+@dataclass
+class FakeSession:
+    """Лёгкая замена сессии БД: exec() отдаёт результаты из очереди и запоминает запросы"""
+    info: dict = field(default_factory=dict)
+    statements: list = field(default_factory=list)
+    added: list = field(default_factory=list)
+    commits: int = 0
+    flushes: int = 0
+    _results: deque = field(default_factory=deque)
+
+    def queue_first(self, *rows):
+        """Поставить по одному результату на каждую строку (для exec(...).first())"""
+        self._results.extend([row] for row in rows)
+
+    def queue_all(self, *rows):
+        """Поставить один результат со всеми строками (для exec(...).all())"""
+        self._results.append(list(rows))
+
+    def exec(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self._results.popleft() if self._results else [])
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def add_all(self, objs):
+        self.added.extend(objs)
+
+    def flush(self):
+        self.flushes += 1
+
+    def commit(self):
+        self.commits += 1
+
+    def refresh(self, obj):
+        pass
+
+
+@pytest.fixture
+def fake_session():
+    """Сессия БД без MagicMock: результаты ставятся через queue_first()/queue_all()"""
+    return FakeSession()
+
+
+@pytest.fixture(scope="session")
+def sqlite_engine():
+    """In-memory SQLite со схемой всех моделей, создаётся один раз на процесс pytest"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+
+    # pysqlite сам открывает транзакции и ломает SAVEPOINT — берём BEGIN на себя
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(sqlite_engine):
+    """Настоящая сессия SQLModel поверх sqlite_engine; всё записанное тестом откатывается"""
+    connection = sqlite_engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def patch_player_effects(monkeypatch):
+    """Подменяет эффекты игроков в shop_service и game_effects_service стабом get_effects(db_session, game_id, user_id).
+
+    Батч-версия get_or_create_players_effects собирается из того же стаба по каждому user_id.
+    """
+    import bot.handlers.game.game_effects_service as ges
+    import bot.handlers.game.shop_service as shop_service
+
+    def apply(get_effects):
+        def get_players_effects(db_session, game_id, user_ids):
+            return {user_id: get_effects(db_session, game_id, user_id) for user_id in user_ids}
+
+        monkeypatch.setattr(shop_service, 'get_or_create_player_effects', get_effects)
+        monkeypatch.setattr(ges, 'get_or_create_player_effects', get_effects)
+        monkeypatch.setattr(ges, 'get_or_create_players_effects', get_players_effects)
+
+    return apply
+
+
 @pytest.fixture
 def mock_tg_user():
     """Мок пользователя Telegram"""
@@ -31,7 +177,7 @@ def mock_tg_user():
     user.username = "testuser"
     user.first_name = "Test"
     user.last_name = "User"
-    user.full_username = MagicMock(return_value="@testuser")
+    user.full_username.return_value = "@testuser"
     return user
 
 
@@ -43,7 +189,6 @@ def mock_game(mock_db_session):
     game.chat_id = 987654321
     game.players = []
     game.results = MagicMock()
-    game.results.append = MagicMock()
     return game
 
 
@@ -51,14 +196,10 @@ def mock_game(mock_db_session):
 def mock_update():
     """Мок объекта Update от telegram"""
     update = MagicMock()
-    update.effective_chat = MagicMock()
     update.effective_chat.id = 987654321
     update.effective_chat.send_message = AsyncMock()
-    update.effective_message = MagicMock()
     update.effective_message.reply_markdown_v2 = AsyncMock()
-    update.message = MagicMock()
     update.message.reply_markdown_v2 = AsyncMock()
-    update.message.from_user = MagicMock()
     update.message.from_user.name = "TestUser"
     update.message.text = "/pidor"
     return update
@@ -74,7 +215,6 @@ def mock_context(mock_db_session, mock_tg_user):
     # Инициализируем bot_data для поддержки chat_whitelist проверки
     context.bot_data = {'chat_whitelist': None}  # None = нет ограничений (все чаты разрешены)
     # Мокируем bot с async методами
-    context.bot = MagicMock()
     context.bot.send_message = AsyncMock()
     context.bot.get_chat_member = AsyncMock()
     return context
@@ -99,6 +239,60 @@ def sample_players():
     return players
 
 
+def fake_dt(year=2024, month=12, day=29):
+    """Лёгкая замена current_datetime(): year/month/day, timetuple(), date() и astimezone()"""
+    moment = datetime(year, month, day)
+    return SimpleNamespace(
+        year=year, month=month, day=day,
+        timetuple=moment.timetuple, date=moment.date, astimezone=moment.astimezone,
+    )
+
+
+@pytest.fixture
+def dec29_dt():
+    """Дата 29 декабря 2024 (день старта финального голосования)"""
+    return fake_dt(2024, 12, 29)
+
+
+@pytest.fixture
+def jun15_dt():
+    """Дата 15 июня 2024 (вне периода финального голосования)"""
+    return fake_dt(2024, 6, 15)
+
+
+@pytest.fixture
+def patched_now(request, monkeypatch):
+    """Патч current_datetime в командах игры.
+
+    Момент задаётся маркером @pytest.mark.freeze_at("2024-12-30T13:00") или через patched_now.return_value;
+    по умолчанию 15 июня 2024 (вне периода финального голосования).
+    """
+    import bot.handlers.game.commands as commands
+    marker = request.node.get_closest_marker("freeze_at")
+    now = datetime.fromisoformat(marker.args[0]) if marker else datetime(2024, 6, 15)
+    clock = SimpleNamespace(return_value=now)
+    monkeypatch.setattr(commands, 'current_datetime', lambda: clock.return_value)
+    return clock
+
+
+@pytest.fixture
+def allowed_closers(monkeypatch):
+    """Список username, которым разрешено закрывать финальное голосование (можно менять в тесте)"""
+    import bot.handlers.game.commands as commands
+    closers = ['test_admin']
+    monkeypatch.setattr(commands, 'get_allowed_final_voting_closers', lambda: closers)
+    return closers
+
+
+@pytest.fixture
+def no_sleep(mocker):
+    """Глушит asyncio.sleep в командах игры (паузы между этапами pidor_cmd); мок доступен для проверок.
+
+    Подключается в модулях через pytestmark = pytest.mark.usefixtures("no_sleep").
+    """
+    return mocker.patch('bot.handlers.game.commands.asyncio.sleep', new_callable=AsyncMock)
+
+
 @pytest.fixture(autouse=True)
 def mock_achievement_user_relationship(mock_context):
     """При db_session.add(UserAchievement) автоматически ставит .user из game.players."""
@@ -142,7 +336,12 @@ def mock_shop_effects(request, mocker):
     mock_effect.immunity_until = None
     mock_effect.double_chance_until = None
     mock_effect.immunity_last_used = None
-    # Патчим в обоих местах - в shop_service и в game_effects_service
+    # Патчим в обоих местах - в shop_service и в game_effects_service,
+    # включая батч-загрузку эффектов для фильтра защиты
     mocker.patch('bot.handlers.game.shop_service.get_or_create_player_effects', return_value=mock_effect)
     mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=mock_effect)
+    mocker.patch(
+        'bot.handlers.game.game_effects_service.get_or_create_players_effects',
+        side_effect=lambda db_session, game_id, user_ids: {user_id: mock_effect for user_id in user_ids},
+    )
     return mock_effect
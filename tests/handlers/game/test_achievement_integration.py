@@ -8,10 +8,13 @@ from bot.handlers.game.commands import pidor_cmd
 from bot.handlers.game.config import GameConstants
 from bot.app.models import GameResult, UserAchievement
 
+# Паузы между этапами pidor_cmd заглушены для всего модуля
+pytestmark = pytest.mark.usefixtures("no_sleep")
+
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_first_blood_awarded_on_first_win(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_first_blood_awarded_on_first_win(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Интеграционный тест выдачи достижения 'Первая кровь' при первой победе."""
     # Setup
     mock_game.players = sample_players
@@ -49,12 +52,9 @@ async def test_first_blood_awarded_on_first_win(mock_update, mock_context, mock_
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep', new_callable=AsyncMock)
-
-    # Mock get_or_create_player_effects
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects',
-                 return_value=MagicMock(immunity_year=None, immunity_day=None))
+    # Mock player effects (no immunity)
+    no_effects = MagicMock(immunity_year=None, immunity_day=None)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
 
     # Mock exec для предсказаний и достижений
     def mock_exec_side_effect(stmt):
@@ -126,7 +126,7 @@ async def test_first_blood_awarded_on_first_win(mock_update, mock_context, mock_
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_streak_achievements_awarded_correctly(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_streak_achievements_awarded_correctly(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Интеграционный тест выдачи достижений за серии побед."""
     # Setup
     mock_game.players = sample_players
@@ -164,12 +164,9 @@ async def test_streak_achievements_awarded_correctly(mock_update, mock_context,
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep', new_callable=AsyncMock)
-
-    # Mock get_or_create_player_effects
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects',
-                 return_value=MagicMock(immunity_year=None, immunity_day=None))
+    # Mock player effects (no immunity)
+    no_effects = MagicMock(immunity_year=None, immunity_day=None)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
 
     # Create mock game results for 3-win streak
     mock_results = [
@@ -246,7 +243,7 @@ async def test_streak_achievements_awarded_correctly(mock_update, mock_context,
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_achievements_isolated_by_game(mock_update, mock_context, sample_players, mocker):
+async def test_achievements_isolated_by_game(mock_update, mock_context, sample_players, mocker, patch_player_effects):
     """Проверка изоляции достижений по играм."""
     from bot.app.models import Game
 
@@ -278,12 +275,9 @@ async def test_achievements_isolated_by_game(mock_update, mock_context, sample_p
         winner, "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep', new_callable=AsyncMock)
-
-    # Mock get_or_create_player_effects
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects',
-                 return_value=MagicMock(immunity_year=None, immunity_day=None))
+    # Mock player effects (no immunity)
+    no_effects = MagicMock(immunity_year=None, immunity_day=None)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
 
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
@@ -417,7 +411,7 @@ async def test_achievements_isolated_by_game(mock_update, mock_context, sample_p
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_achievement_coins_added_to_balance(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_achievement_coins_added_to_balance(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Проверка начисления койнов за достижения."""
     # Setup
     mock_game.players = sample_players
@@ -455,12 +449,9 @@ async def test_achievement_coins_added_to_balance(mock_update, mock_context, moc
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep', new_callable=AsyncMock)
-
-    # Mock get_or_create_player_effects
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects',
-                 return_value=MagicMock(immunity_year=None, immunity_day=None))
+    # Mock player effects (no immunity)
+    no_effects = MagicMock(immunity_year=None, immunity_day=None)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
 
     # Mock exec
     def mock_exec_side_effect(stmt):
@@ -523,7 +514,7 @@ async def test_achievement_coins_added_to_balance(mock_update, mock_context, moc
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_achievements_disabled_no_awards(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_achievements_disabled_no_awards(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Проверка что достижения не выдаются при отключённом флаге."""
     # Setup
     mock_game.players = sample_players
@@ -561,12 +552,9 @@ async def test_achievements_disabled_no_awards(mock_update, mock_context, mock_g
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep', new_callable=AsyncMock)
-
-    # Mock get_or_create_player_effects
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects',
-                 return_value=MagicMock(immunity_year=None, immunity_day=None))
+    # Mock player effects (no immunity)
+    no_effects = MagicMock(immunity_year=None, immunity_day=None)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
 
     # Mock exec
     def mock_exec_side_effect(stmt):
@@ -1,4 +1,5 @@
 """Тесты бонуса именинника."""
+from collections import Counter
 from datetime import date
 from unittest.mock import AsyncMock, MagicMock
 
@@ -81,11 +82,9 @@ def test_pool_birthday_x4_multiplier(mock_db_session):
         date(2026, 5, 13), birthday_multiplier=4,
     )
 
-    assert pool.count(birthday_player) == 4
-    assert pool.count(other) == 1
-    assert birthday_player.id in bd
-    assert other.id not in bd
-    assert birthday_player.id not in dc
+    assert Counter(p.id for p in pool) == {1: 4, 2: 1}
+    assert bd == {birthday_player.id}
+    assert len(dc) == 0
 
 
 @pytest.mark.unit
@@ -100,8 +99,7 @@ def test_pool_birthday_disabled_when_multiplier_is_1(mock_db_session):
     )
 
     # multiplier=1 → фича отключена, никаких бонусов
-    assert pool.count(birthday_player) == 1
-    assert pool.count(other) == 1
+    assert Counter(p.id for p in pool) == {1: 1, 2: 1}
     assert len(bd) == 0
 
 
@@ -126,10 +124,9 @@ def test_pool_birthday_combines_with_double_chance(mock_db_session):
         date(2026, 5, 13), birthday_multiplier=4,
     )
 
-    assert pool.count(birthday_player) == 8  # 2 ** 1 * 4
-    assert pool.count(other) == 1
-    assert birthday_player.id in dc
-    assert birthday_player.id in bd
+    assert Counter(p.id for p in pool) == {1: 8, 2: 1}  # 2 ** 1 * 4
+    assert dc == {birthday_player.id}
+    assert bd == {birthday_player.id}
 
 
 @pytest.mark.unit
@@ -143,8 +140,7 @@ def test_pool_no_birthdays_today(mock_db_session):
         date(2026, 5, 13), birthday_multiplier=4,
     )
 
-    assert pool.count(p1) == 1
-    assert pool.count(p2) == 1
+    assert Counter(p.id for p in pool) == {1: 1, 2: 1}
     assert len(bd) == 0
 
 
@@ -324,9 +320,7 @@ def test_pool_multiple_birthday_players(mock_db_session):
         date(2026, 5, 13), birthday_multiplier=4,
     )
 
-    assert pool.count(bd1) == 4
-    assert pool.count(bd2) == 4
-    assert pool.count(other) == 1
+    assert Counter(p.id for p in pool) == {1: 4, 2: 4, 3: 1}
     assert {bd1.id, bd2.id} == bd
     assert other.id not in bd
 
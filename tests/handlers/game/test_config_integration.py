@@ -173,7 +173,7 @@ def test_default_chat_uses_default_prices(custom_config_file, reset_global_confi
 
 
 @pytest.mark.integration
-def test_shop_with_custom_prices(custom_config_file, reset_global_config, mock_db_session, mock_game, sample_players, mocker):
+def test_shop_with_custom_prices(custom_config_file, reset_global_config, mock_db_session, mock_game, sample_players, mocker, patch_player_effects):
     """Test shop operations work correctly with custom prices."""
     from bot.handlers.game.shop_service import buy_immunity, buy_double_chance, create_prediction
     from bot.app.models import GamePlayerEffect
@@ -191,7 +191,7 @@ def test_shop_with_custom_prices(custom_config_file, reset_global_config, mock_d
 
         # Mock player effects
         mock_effect = GamePlayerEffect(game_id=game_id, user_id=user_id)
-        mocker.patch('bot.handlers.game.shop_service.get_or_create_player_effects', return_value=mock_effect)
+        patch_player_effects(lambda db_session, game_id, user_id: mock_effect)
 
         # Mock can_afford to return True
         mocker.patch('bot.handlers.game.shop_service.can_afford', return_value=True)
@@ -472,7 +472,7 @@ def test_message_prices_match_config(custom_config_file, reset_global_config):
 
 
 @pytest.mark.integration
-def test_feature_flags_prevent_operations(feature_flags_config_file, reset_global_config, mock_db_session, mock_game, sample_players, mocker):
+def test_feature_flags_prevent_operations(feature_flags_config_file, reset_global_config, mock_db_session, mock_game, sample_players, mocker, patch_player_effects):
     """Test that feature flags prevent operations from being executed."""
     from bot.handlers.game.shop_service import buy_immunity, buy_double_chance, create_prediction
 
@@ -492,7 +492,7 @@ def test_feature_flags_prevent_operations(feature_flags_config_file, reset_globa
         # Mock player effects for immunity
         from bot.app.models import GamePlayerEffect
         mock_effect = GamePlayerEffect(game_id=game_id, user_id=user_id)
-        mocker.patch('bot.handlers.game.shop_service.get_or_create_player_effects', return_value=mock_effect)
+        patch_player_effects(lambda db_session, game_id, user_id: mock_effect)
         mocker.patch('bot.handlers.game.shop_service.can_afford', return_value=True)
         mocker.patch('bot.handlers.game.transfer_service.get_or_create_chat_bank', return_value=MagicMock(balance=0))
 
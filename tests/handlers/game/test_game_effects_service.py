@@ -1,6 +1,5 @@
 """Tests for game effects service functionality."""
 import pytest
-from unittest.mock import MagicMock
 from datetime import date, datetime
 
 from bot.handlers.game.game_effects_service import (
@@ -8,241 +7,119 @@ from bot.handlers.game.game_effects_service import (
     build_selection_pool,
     check_winner_immunity,
     reset_double_chance,
-    is_immunity_enabled
+    is_immunity_enabled,
+    SelectionPool,
 )
 from bot.app.models import TGUser, GamePlayerEffect
 
 
-@pytest.mark.unit
-def test_filter_protected_players_separates_correctly(mock_db_session):
-    """Test filter_protected_players correctly separates protected and unprotected players."""
-    from bot.handlers.game.shop_service import get_or_create_player_effects
-
-    # Setup
-    game_id = 1
-    current_date = date(2024, 6, 15)  # Day 167
-    current_year = 2024
-    current_day = 167
-
-    # Create test players
-    player1 = TGUser(id=1, tg_id=101, first_name="Player1", username="player1")
-    player2 = TGUser(id=2, tg_id=102, first_name="Player2", username="player2")
-    player3 = TGUser(id=3, tg_id=103, first_name="Player3", username="player3")
-    players = [player1, player2, player3]
-
-    # Mock effects: player1 protected today, player2 and player3 not protected
-    effect1 = GamePlayerEffect(
-        game_id=game_id,
-        user_id=player1.id,
-        immunity_year=current_year,
-        immunity_day=current_day  # Protected today
-    )
-
-    effect2 = GamePlayerEffect(
-        game_id=game_id,
-        user_id=player2.id,
-        immunity_year=None,
-        immunity_day=None  # Not protected
-    )
-
-    effect3 = GamePlayerEffect(
-        game_id=game_id,
-        user_id=player3.id,
-        immunity_year=2024,
-        immunity_day=166  # Protection expired yesterday
-    )
-
-    # Mock get_or_create_player_effects
-    def mock_get_effects(db_session, game_id, user_id):
-        if user_id == player1.id:
-            return effect1
-        elif user_id == player2.id:
-            return effect2
-        else:
-            return effect3
-
-    # Patch the function in game_effects_service where it's used
-    import bot.handlers.game.game_effects_service as ges
-    original_get_effects = ges.get_or_create_player_effects
-    ges.get_or_create_player_effects = mock_get_effects
-
-    try:
-        # Execute
-        unprotected, protected = filter_protected_players(mock_db_session, game_id, players, current_date)
-
-        # Verify
-        assert len(unprotected) == 2
-        assert len(protected) == 1
-        assert player1 in protected
-        assert player2 in unprotected
-        assert player3 in unprotected
-    finally:
-        # Restore original function
-        ges.get_or_create_player_effects = original_get_effects
+def _make_players(count):
+    """Build players with ids 1..count."""
+    return [
+        TGUser(id=i, tg_id=100 + i, first_name=f"Player{i}", username=f"player{i}")
+        for i in range(1, count + 1)
+    ]
 
 
 @pytest.mark.unit
-def test_filter_protected_players_all_protected(mock_db_session):
-    """Test filter_protected_players when all players are protected."""
+@pytest.mark.parametrize("immunity_days, expected_protected_ids", [
+    # player1 protected today, player2 never protected, player3 protection expired yesterday
+    pytest.param([167, None, 166], {1}, id="separates_correctly"),
+    pytest.param([167, 167], {1, 2}, id="all_protected"),
+    pytest.param([None, None], set(), id="none_protected"),
+])
+def test_filter_protected_players(fake_session, immunity_days, expected_protected_ids):
+    """Test filter_protected_players separates players by today's immunity using one query."""
     # Setup
     game_id = 1
     current_date = date(2024, 6, 15)  # Day 167
-    current_year = 2024
-    current_day = 167
+    players = _make_players(len(immunity_days))
 
-    player1 = TGUser(id=1, tg_id=101, first_name="Player1", username="player1")
-    player2 = TGUser(id=2, tg_id=102, first_name="Player2", username="player2")
-    players = [player1, player2]
-
-    # Mock all players protected today
-    def mock_get_effects(db_session, game_id, user_id):
-        return GamePlayerEffect(
+    # One batched query returns the effects of all players
+    fake_session.queue_all(*[
+        GamePlayerEffect(
             game_id=game_id,
-            user_id=user_id,
-            immunity_year=current_year,
-            immunity_day=current_day
+            user_id=player.id,
+            immunity_year=2024 if day is not None else None,
+            immunity_day=day,
         )
-
-    # Patch the function
-    import bot.handlers.game.game_effects_service as ges
-    original_get_effects = ges.get_or_create_player_effects
-    ges.get_or_create_player_effects = mock_get_effects
-
-    try:
-        # Execute
-        unprotected, protected = filter_protected_players(mock_db_session, game_id, players, current_date)
-
-        # Verify
-        assert len(unprotected) == 0
-        assert len(protected) == 2
-    finally:
-        ges.get_or_create_player_effects = original_get_effects
-
-
-@pytest.mark.unit
-def test_filter_protected_players_none_protected(mock_db_session):
-    """Test filter_protected_players when no players are protected."""
-    # Setup
-    game_id = 1
-    current_date = date(2024, 6, 15)
-
-    player1 = TGUser(id=1, tg_id=101, first_name="Player1", username="player1")
-    player2 = TGUser(id=2, tg_id=102, first_name="Player2", username="player2")
-    players = [player1, player2]
-
-    # Mock no players protected
-    effect = GamePlayerEffect(
-        game_id=game_id,
-        user_id=0,
-        immunity_year=None,
-        immunity_day=None
-    )
-
-    mock_result = MagicMock()
-    mock_result.first.return_value = effect
-    mock_db_session.exec.return_value = mock_result
+        for player, day in zip(players, immunity_days)
+    ])
 
     # Execute
-    unprotected, protected = filter_protected_players(mock_db_session, game_id, players, current_date)
+    unprotected, protected = filter_protected_players(fake_session, game_id, players, current_date)
 
     # Verify
-    assert len(unprotected) == 2
-    assert len(protected) == 0
+    assert protected == [p for p in players if p.id in expected_protected_ids]
+    assert unprotected == [p for p in players if p.id not in expected_protected_ids]
+    assert len(fake_session.statements) == 1
+    assert fake_session.added == []
 
 
 @pytest.mark.unit
-def test_build_selection_pool_with_double_chance(mock_db_session):
-    """Test build_selection_pool adds players with double chance twice."""
-    from bot.app.models import DoubleChancePurchase
-
+def test_immunity_checks_skip_db_on_last_day(fake_session):
+    """Test filter_protected_players and check_winner_immunity do not query effects on December 31."""
     # Setup
     game_id = 1
-    current_date = date(2024, 6, 15)  # Day 166
-    current_year = 2024
-    current_day = 166
-
-    player1 = TGUser(id=1, tg_id=101, first_name="Player1", username="player1")
-    player2 = TGUser(id=2, tg_id=102, first_name="Player2", username="player2")
-    players = [player1, player2]
-
-    # Mock double chance purchases: player1 has active purchase for today
-    purchase1 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=3,
-        target_id=player1.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-
-    mock_result = MagicMock()
-    mock_result.all.return_value = [purchase1]
-    mock_db_session.exec.return_value = mock_result
+    current_date = date(2024, 12, 31)
+    players = _make_players(2)
 
     # Execute
-    pool, double_chance_players, _birthday_players = build_selection_pool(mock_db_session, game_id, players, current_date)
+    unprotected, protected = filter_protected_players(fake_session, game_id, players, current_date)
+    result = check_winner_immunity(fake_session, game_id, players[0], current_date)
 
-    # Verify
-    assert len(pool) == 3  # player1 twice + player2 once
-    assert pool.count(player1) == 2
-    assert pool.count(player2) == 1
-    assert player1.id in double_chance_players
-    assert player2.id not in double_chance_players
+    # Verify everyone is unprotected without any DB call
+    assert unprotected == players
+    assert protected == []
+    assert result is None
+    assert fake_session.statements == []
 
 
 @pytest.mark.unit
-def test_build_selection_pool_multiple_double_chance(mock_db_session):
-    """Test build_selection_pool with multiple players having double chance."""
+@pytest.mark.parametrize("player_count, purchase_targets, expected_weights", [
+    # 1 purchase = 2^1 = 2 entries
+    pytest.param(2, [1], [2, 1], id="single_double_chance"),
+    pytest.param(3, [1, 3], [2, 1, 2], id="multiple_players"),
+    # 2 purchases for the same player = 2^2 = 4 entries
+    pytest.param(2, [1, 1], [4, 1], id="exponential"),
+    # 3 purchases for the same player = 2^3 = 8 entries
+    pytest.param(3, [1, 1, 1], [8, 1, 1], id="triple"),
+])
+def test_build_selection_pool_double_chance(fake_session, player_count, purchase_targets, expected_weights):
+    """Test build_selection_pool weights players exponentially by their double chance purchases."""
     from bot.app.models import DoubleChancePurchase
 
     # Setup
     game_id = 1
-    current_date = date(2024, 6, 15)  # Day 166
-    current_year = 2024
-    current_day = 166
-
-    player1 = TGUser(id=1, tg_id=101, first_name="Player1", username="player1")
-    player2 = TGUser(id=2, tg_id=102, first_name="Player2", username="player2")
-    player3 = TGUser(id=3, tg_id=103, first_name="Player3", username="player3")
-    players = [player1, player2, player3]
-
-    # Mock double chance purchases: player1 and player3 have active purchases (1 each)
-    purchase1 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=4,
-        target_id=player1.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-    purchase3 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=5,
-        target_id=player3.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
+    current_date = date(2024, 6, 15)  # Day 167
+    players = _make_players(player_count)
 
-    mock_result = MagicMock()
-    mock_result.all.return_value = [purchase1, purchase3]
-    mock_db_session.exec.return_value = mock_result
+    # Active purchases for today, each from a different buyer
+    fake_session.queue_all(*[
+        DoubleChancePurchase(
+            game_id=game_id,
+            buyer_id=10 + i,
+            target_id=target_id,
+            year=2024,
+            day=167,
+            is_used=False
+        )
+        for i, target_id in enumerate(purchase_targets)
+    ])
 
     # Execute
-    pool, double_chance_players, _birthday_players = build_selection_pool(mock_db_session, game_id, players, current_date)
+    pool, double_chance_players, _birthday_players = build_selection_pool(fake_session, game_id, players, current_date)
 
-    # Verify - with exponential logic: 1 purchase = 2^1 = 2 entries
-    assert len(pool) == 5  # player1 (2^1=2) + player2 (1) + player3 (2^1=2)
-    assert pool.count(player1) == 2
-    assert pool.count(player2) == 1
-    assert pool.count(player3) == 2
-    assert len(double_chance_players) == 2
-    assert player1.id in double_chance_players
-    assert player3.id in double_chance_players
+    # Verify
+    assert pool.weights == expected_weights  # Stored as weights, not duplicated list entries
+    assert len(pool) == sum(expected_weights)
+    assert [pool.count(player) for player in players] == expected_weights
+    assert double_chance_players == set(purchase_targets)
+    assert len(fake_session.statements) == 1  # One purchases query for all players
 
 
 @pytest.mark.unit
-def test_check_winner_immunity_active(mock_db_session):
+def test_check_winner_immunity_active(fake_session):
     """Test check_winner_immunity returns buyer_id when winner is protected."""
     # Setup
     game_id = 1
@@ -260,28 +137,18 @@ def test_check_winner_immunity_active(mock_db_session):
         immunity_buyer_id=None
     )
 
-    # Mock get_or_create_player_effects
-    def mock_get_effects(db_session, game_id, user_id):
-        return effect
-
-    # Patch the function
-    import bot.handlers.game.game_effects_service as ges
-    original_get_effects = ges.get_or_create_player_effects
-    ges.get_or_create_player_effects = mock_get_effects
+    fake_session.queue_first(effect)
 
-    try:
-        # Execute
-        result = check_winner_immunity(mock_db_session, game_id, winner, current_date)
+    # Execute
+    result = check_winner_immunity(fake_session, game_id, winner, current_date)
 
-        # Verify: returns winner.id (self-protection fallback) when buyer_id is None
-        assert result is not None
-        assert result == winner.id
-    finally:
-        ges.get_or_create_player_effects = original_get_effects
+    # Verify: returns winner.id (self-protection fallback) when buyer_id is None
+    assert result is not None
+    assert result == winner.id
 
 
 @pytest.mark.unit
-def test_check_winner_immunity_expired(mock_db_session):
+def test_check_winner_immunity_expired(fake_session):
     """Test check_winner_immunity returns False when immunity is expired."""
     # Setup
     game_id = 1
@@ -296,187 +163,81 @@ def test_check_winner_immunity_expired(mock_db_session):
         immunity_day=165  # Yesterday
     )
 
-    mock_result = MagicMock()
-    mock_result.first.return_value = effect
-    mock_db_session.exec.return_value = mock_result
+    fake_session.queue_first(effect)
 
     # Execute
-    result = check_winner_immunity(mock_db_session, game_id, winner, current_date)
+    result = check_winner_immunity(fake_session, game_id, winner, current_date)
 
     # Verify: returns None when not protected
     assert result is None
 
 
 @pytest.mark.unit
-def test_reset_double_chance(mock_db_session):
-    """Test reset_double_chance marks purchases as used."""
-    from bot.app.models import DoubleChancePurchase
+def test_reset_double_chance(fake_session):
+    """Test reset_double_chance marks purchases as used with a single UPDATE."""
+    from sqlalchemy.sql.dml import Update
 
     # Setup
     game_id = 1
     user_id = 1
-    current_date = date(2024, 6, 15)  # Day 166
-    current_year = 2024
-    current_day = 166
-
-    # Mock active double chance purchases for today
-    purchase1 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=2,
-        target_id=user_id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-    purchase2 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=3,
-        target_id=user_id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-
-    mock_result = MagicMock()
-    mock_result.all.return_value = [purchase1, purchase2]
-    mock_db_session.exec.return_value = mock_result
-
-    # Execute
-    reset_double_chance(mock_db_session, game_id, user_id, current_date)
-
-    # Verify both purchases are marked as used
-    assert purchase1.is_used is True
-    assert purchase2.is_used is True
-    assert mock_db_session.add.call_count == 2
-
-
-@pytest.mark.unit
-def test_is_immunity_enabled_normal_day():
-    """Test is_immunity_enabled returns True on normal day."""
-    # Setup - normal day (not December 31)
-    current_dt = datetime(2024, 6, 15, 12, 0, 0)
+    current_date = date(2024, 6, 15)  # Day 167
 
     # Execute
-    result = is_immunity_enabled(current_dt)
-
-    # Verify
-    assert result is True
+    reset_double_chance(fake_session, game_id, user_id, current_date)
+
+    # Verify one UPDATE sets is_used for today's purchases of this player
+    assert len(fake_session.statements) == 1
+    stmt = fake_session.statements[0]
+    assert isinstance(stmt, Update)
+    assert stmt.compile().params == {
+        'is_used': True,
+        'game_id_1': game_id,
+        'target_id_1': user_id,
+        'year_1': 2024,
+        'day_1': 167,
+    }
+    assert fake_session.added == []
 
 
 @pytest.mark.unit
-def test_is_immunity_enabled_last_day():
-    """Test is_immunity_enabled returns False on last day of year."""
-    # Setup - December 31
-    current_dt = datetime(2024, 12, 31, 12, 0, 0)
-
-    # Execute
-    result = is_immunity_enabled(current_dt)
-
-    # Verify
-    assert result is False
+@pytest.mark.parametrize("current_dt, expected", [
+    pytest.param(datetime(2024, 6, 15, 12, 0, 0), True, id="normal_day"),
+    pytest.param(datetime(2024, 12, 31, 12, 0, 0), False, id="last_day"),
+    pytest.param(date(2024, 6, 15), True, id="normal_day_date"),
+    pytest.param(date(2024, 12, 31), False, id="last_day_date"),
+])
+def test_is_immunity_enabled(current_dt, expected):
+    """Test is_immunity_enabled is off only on the last day of the year."""
+    assert is_immunity_enabled(current_dt) is expected
 
 
 @pytest.mark.unit
-def test_build_selection_pool_exponential_double_chance(mock_db_session):
-    """Test build_selection_pool with exponential logic - 2 purchases = 4 entries."""
-    from bot.app.models import DoubleChancePurchase
+def test_selection_pool_indexes_by_weight():
+    """Test SelectionPool behaves like a list with each player repeated by its weight."""
+    player1, player2, player3 = _make_players(3)
 
-    # Setup
-    game_id = 1
-    current_date = date(2024, 6, 15)  # Day 166
-    current_year = 2024
-    current_day = 166
-
-    player1 = TGUser(id=1, tg_id=101, first_name="Player1", username="player1")
-    player2 = TGUser(id=2, tg_id=102, first_name="Player2", username="player2")
-    players = [player1, player2]
-
-    # Mock double chance purchases: player1 has 2 purchases from different buyers
-    purchase1 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=3,
-        target_id=player1.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-    purchase2 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=4,
-        target_id=player1.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-
-    mock_result = MagicMock()
-    mock_result.all.return_value = [purchase1, purchase2]
-    mock_db_session.exec.return_value = mock_result
+    pool = SelectionPool([player1, player2, player3], [4, 1, 2])
 
-    # Execute
-    pool, double_chance_players, _birthday_players = build_selection_pool(mock_db_session, game_id, players, current_date)
-
-    # Verify - with exponential logic: 2 purchases = 2^2 = 4 entries
-    assert len(pool) == 5  # player1 (2^2=4) + player2 (1)
+    assert len(pool) == 7
+    assert list(pool) == [player1] * 4 + [player2] + [player3] * 2
+    assert pool[-1] is player3
+    assert pool[3:6] == [player1, player2, player3]
+    assert pool[::-3] == [player3, player1, player1]
     assert pool.count(player1) == 4
-    assert pool.count(player2) == 1
-    assert len(double_chance_players) == 1
-    assert player1.id in double_chance_players
+    assert pool.index(player3) == 5
+    assert player2 in pool
+    with pytest.raises(IndexError):
+        pool[7]
 
 
 @pytest.mark.unit
-def test_build_selection_pool_triple_double_chance(mock_db_session):
-    """Test build_selection_pool with exponential logic - 3 purchases = 8 entries."""
-    from bot.app.models import DoubleChancePurchase
+def test_selection_pool_lookups_skip_zero_weight():
+    """Test a player with zero weight is not found in SelectionPool."""
+    player1, player2 = _make_players(2)
 
-    # Setup
-    game_id = 1
-    current_date = date(2024, 6, 15)  # Day 166
-    current_year = 2024
-    current_day = 166
-
-    player1 = TGUser(id=1, tg_id=101, first_name="Player1", username="player1")
-    player2 = TGUser(id=2, tg_id=102, first_name="Player2", username="player2")
-    player3 = TGUser(id=3, tg_id=103, first_name="Player3", username="player3")
-    players = [player1, player2, player3]
-
-    # Mock double chance purchases: player1 has 3 purchases from different buyers
-    purchase1 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=4,
-        target_id=player1.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-    purchase2 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=5,
-        target_id=player1.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-    purchase3 = DoubleChancePurchase(
-        game_id=game_id,
-        buyer_id=6,
-        target_id=player1.id,
-        year=current_year,
-        day=current_day,
-        is_used=False
-    )
-
-    mock_result = MagicMock()
-    mock_result.all.return_value = [purchase1, purchase2, purchase3]
-    mock_db_session.exec.return_value = mock_result
+    pool = SelectionPool([player1, player2], [0, 2])
 
-    # Execute
-    pool, double_chance_players, _birthday_players = build_selection_pool(mock_db_session, game_id, players, current_date)
-
-    # Verify - with exponential logic: 3 purchases = 2^3 = 8 entries
-    assert len(pool) == 10  # player1 (2^3=8) + player2 (1) + player3 (1)
-    assert pool.count(player1) == 8
-    assert pool.count(player2) == 1
-    assert pool.count(player3) == 1
-    assert len(double_chance_players) == 1
-    assert player1.id in double_chance_players
+    assert player1 not in pool
+    assert pool.index(player2, 1) == 1
+    with pytest.raises(ValueError):
+        pool.index(player1)
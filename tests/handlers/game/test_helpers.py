@@ -1,8 +1,15 @@
 """Tests for helper functions in game handler."""
 import pytest
+from types import SimpleNamespace
+
 from bot.handlers.game.commands import build_player_table
 
 
+def _user(full_username, user_id=1):
+    """Minimal stand-in for TGUser: build_player_table only reads id and full_username()."""
+    return SimpleNamespace(id=user_id, full_username=lambda: full_username)
+
+
 @pytest.mark.unit
 def test_build_player_table_empty_list():
     """Test that empty list returns empty string."""
@@ -11,11 +18,9 @@ def test_build_player_table_empty_list():
 
 
 @pytest.mark.unit
-def test_build_player_table_single_player(mock_tg_user):
+def test_build_player_table_single_player():
     """Test formatting for a single player."""
-    mock_tg_user.full_username.return_value = "@TestUser"
-    
-    result = build_player_table([(mock_tg_user, 5)])
+    result = build_player_table([(_user("@TestUser"), 5)])
     
     assert "1\\." in result
     assert "TestUser" in result
@@ -41,12 +46,10 @@ def test_build_player_table_multiple_players(sample_players):
 
 
 @pytest.mark.unit
-def test_build_player_table_escapes_markdown(mock_tg_user):
+def test_build_player_table_escapes_markdown():
     """Test that special markdown characters are escaped."""
-    # Set username with special characters that need escaping
-    mock_tg_user.full_username.return_value = "User_with*special[chars]"
-    
-    result = build_player_table([(mock_tg_user, 3)])
+    # Username with special characters that need escaping
+    result = build_player_table([(_user("User_with*special[chars]"), 3)])
     
     # Check that the result contains escaped characters or the username
     # The escape_markdown2 function should handle special characters
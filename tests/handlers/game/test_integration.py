@@ -1,106 +1,101 @@
 """Integration tests for game handlers."""
 
 import pytest
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Optional
 from unittest.mock import MagicMock, call, AsyncMock
 
+from bot.app.models import Prediction
 from bot.handlers.game.commands import pidor_cmd, pidoreg_cmd, pidorstats_cmd
 from bot.handlers.game.config import GameConstants
+from bot.handlers.game.reroll_service import execute_reroll
+from bot.handlers.game.selection_service import SelectionResult
+from tests.conftest import FakeQuery
+
+# Паузы между этапами pidor_cmd заглушены для всего модуля
+pytestmark = pytest.mark.usefixtures("no_sleep")
 
 # Константы для тестов
 _default_constants = GameConstants()
 COINS_PER_WIN = _default_constants.coins_per_win
 PREDICTION_REWARD = _default_constants.prediction_reward
 REROLL_PRICE = _default_constants.reroll_price
+GIVE_COINS_AMOUNT = _default_constants.give_coins_amount
+GIVE_COINS_WINNER_AMOUNT = _default_constants.give_coins_winner_amount
 
+# Перевыбор в тестах execute_reroll: игра 1, 100-й день 2024 года
+_REROLL_GAME_ID = 1
+_REROLL_YEAR = 2024
+_REROLL_DAY = 100
 
-@pytest.mark.asyncio
-@pytest.mark.integration
-async def test_full_game_flow(mock_update, mock_context, mock_game, sample_players, mocker):
-    """Test full game flow: registration -> game -> stats."""
-    # Mock asyncio.sleep to avoid delays
-    mocker.patch('asyncio.sleep', new_callable=AsyncMock)
+# Фразы этапов, которые random.choice отдаёт после выбора победителя
+_STAGE_PHRASES = ("Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}")
 
-    # Mock random.choice to return first player
-    mock_choice = mocker.patch('bot.handlers.game.commands.random.choice')
-    mock_choice.return_value = sample_players[0]
+# Уже сохранённый клик: has_claimed_today смотрит только на то, что запись есть
+_CLICK = object()
 
-    # Mock datetime to return a specific date
-    mock_dt = MagicMock()
-    mock_dt.year = 2024
-    mock_dt.month = 6
-    mock_dt.day = 15
-    mock_dt.timetuple.return_value.tm_yday = 167
-    mocker.patch('bot.handlers.game.commands.current_datetime', return_value=mock_dt)
 
-    # Setup game with no players initially
-    mock_game.players = []
+@pytest.fixture
+def registered_game(mock_context, mock_game, sample_players, patched_now, jun15_dt):
+    """Game with three registered players on 15 June 2024 (day 167)."""
+    patched_now.return_value = jun15_dt
+    mock_game.players = list(sample_players[:3])
     mock_context.game = mock_game
-
     # Mock the query chain for ensure_game decorator
-    mock_game_query = MagicMock()
-    mock_game_query.filter_by.return_value = mock_game_query
-    mock_game_query.one_or_none.return_value = mock_game
-
-    # Step 1: Register first player
-    mock_context.tg_user = sample_players[0]
-    mock_context.db_session.query.return_value = mock_game_query
+    mock_context.db_session.query.return_value = FakeQuery(mock_game)
+    return mock_game
 
-    await pidoreg_cmd(mock_update, mock_context)
 
-    # Verify first player registration
-    assert sample_players[0] in mock_game.players
-    assert mock_update.effective_message.reply_markdown_v2.call_count >= 1
+@pytest.fixture
+def reroll_config(mocker):
+    """Chat config for execute_reroll: reroll enabled with default price and win reward."""
+    mock_config = mocker.patch('bot.handlers.game.reroll_service.get_config_by_game_id').return_value
+    mock_config.constants.reroll_enabled = True
+    mock_config.constants.reroll_price = REROLL_PRICE
+    mock_config.constants.coins_per_win = COINS_PER_WIN
+    return mock_config
 
-    # Step 2: Register second player
-    mock_context.tg_user = sample_players[1]
-    mock_update.effective_message.reply_markdown_v2.reset_mock()
 
-    await pidoreg_cmd(mock_update, mock_context)
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_registration_flow(mock_update, mock_context, mock_game, sample_players):
+    """Test game flow, step 1: three players register one by one."""
+    # Setup game with no players initially
+    mock_game.players = []
+    mock_context.game = mock_game
+    mock_context.db_session.query.return_value = FakeQuery(mock_game)
 
-    # Verify second player registration
-    assert sample_players[1] in mock_game.players
+    for player in sample_players[:3]:
+        mock_context.tg_user = player
+        mock_update.effective_message.reply_markdown_v2 = AsyncMock()
+        mock_context.db_session.commit = MagicMock()
 
-    # Step 3: Register third player
-    mock_context.tg_user = sample_players[2]
-    mock_update.effective_message.reply_markdown_v2.reset_mock()
+        await pidoreg_cmd(mock_update, mock_context)
 
-    await pidoreg_cmd(mock_update, mock_context)
+        assert player in mock_game.players
+        assert mock_update.effective_message.reply_markdown_v2.called
+        # Одна регистрация — один апдейт — один commit
+        mock_context.db_session.commit.assert_called_once()
 
-    # Verify third player registration
-    assert sample_players[2] in mock_game.players
     assert len(mock_game.players) == 3
 
-    # Reset mocks for game command
-    mock_update.effective_chat.send_message.reset_mock()
-
-    # Mock query for checking missed days (no previous games)
-    mock_missed_query = MagicMock()
-    mock_missed_query.filter_by.return_value = mock_missed_query
-    mock_missed_query.order_by.return_value = mock_missed_query
-    mock_missed_query.first.return_value = None
 
-    # Mock GameResult query to return None (no existing result)
-    mock_result_query = MagicMock()
-    mock_result_query.filter_by.return_value = mock_result_query
-    mock_result_query.one_or_none.return_value = None
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_game_execution(mock_update, mock_context, registered_game, sample_players, mocker):
+    """Test game flow, step 2: the game runs for registered players and stores the result."""
+    # Game for ensure_game, then no previous games (missed days) and no existing GameResult
+    mock_context.db_session.query.side_effect = [FakeQuery(registered_game), FakeQuery(None), FakeQuery(None)]
 
-    # Setup query to return different results for Game, missed days check, and GameResult
-    mock_context.db_session.query.side_effect = [mock_game_query, mock_missed_query, mock_result_query]
-
-    # Mock random.choice for stage phrases
-    mock_choice.side_effect = [
-        sample_players[0],  # winner
-        "Stage 1",
-        "Stage 2",
-        "Stage 3",
-        "Stage 4: {username}",
-    ]
+    # Mock random.choice for winner and stage phrases
+    mock_choice = mocker.patch('bot.handlers.game.commands.random.choice',
+                               side_effect=(sample_players[0], *_STAGE_PHRASES))
 
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
-    # Step 4: Run the game
     await pidor_cmd(mock_update, mock_context)
 
     # Verify game execution - should send 4 messages (dramatic message + 3 stage messages)
@@ -108,28 +103,26 @@ async def test_full_game_flow(mock_update, mock_context, mock_game, sample_playe
     # Since there are no previous games, missed_days = current_day - 1 = 167 - 1 = 166
     assert mock_update.effective_chat.send_message.call_count == 4
 
+    # Winner and all four stage phrases were picked, nothing more
+    assert mock_choice.call_count == 1 + len(_STAGE_PHRASES)
+
     # Verify GameResult was created
-    assert mock_game.results.append.called
+    assert registered_game.results.append.called
     assert mock_context.db_session.commit.called
 
-    # Reset mocks for stats command
-    mock_update.effective_chat.send_message.reset_mock()
 
-    # Setup mock for stats query
-    mock_stats_result = MagicMock()
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_stats_display(mock_update, mock_context, registered_game, sample_players):
+    """Test game flow, step 3: stats list every registered player."""
+    # Setup stats query result
     mock_stats_data = [
         (sample_players[0], 5),
         (sample_players[1], 3),
         (sample_players[2], 2),
     ]
-    mock_stats_result.all.return_value = mock_stats_data
-    mock_context.db_session.exec.return_value = mock_stats_result
-
-    # Reset query side_effect for stats command
-    mock_context.db_session.query.side_effect = None
-    mock_context.db_session.query.return_value = mock_game_query
+    mock_context.db_session.exec.return_value = SimpleNamespace(all=lambda: mock_stats_data)
 
-    # Step 5: Check stats
     await pidorstats_cmd(mock_update, mock_context)
 
     # Verify stats were displayed
@@ -142,355 +135,130 @@ async def test_full_game_flow(mock_update, mock_context, mock_game, sample_playe
     assert 'player_count=3' in message_text or '3' in message_text
 
 
-@pytest.mark.asyncio
-@pytest.mark.integration
-async def test_reroll_with_immunity_protection(mock_update, mock_context, mock_game, sample_players, mocker):
-    """Integration test: full scenario with immunity protection during reroll."""
-    from datetime import date
-    from bot.handlers.game.reroll_service import execute_reroll
+@dataclass(frozen=True)
+class _RerollScenario:
+    """Исход выбора при перевыборе: индексы в sample_players и сработавшие эффекты."""
+    winner_index: int
+    had_immunity: bool = False
+    had_double_chance: bool = False
+    protected_index: Optional[int] = None
+    prediction_hit: bool = False
 
-    # Setup
-    game_id = 1
-    year = 2024
-    day = 100
-    current_date = date(2024, 4, 10)  # День 100 в 2024 году
 
-    # Игроки: [0] - старый победитель, [1] - защищённый, [2] - новый победитель
+@pytest.fixture
+def reroll_env(mock_context, sample_players, mocker, reroll_config):
+    """GameResult for 2024-100 won by sample_players[0], plus patched coin, selection and prediction calls."""
     old_winner = sample_players[0]
-    old_winner.id = 1
-    protected_player = sample_players[1]
-    protected_player.id = 2
-    final_winner = sample_players[2]
-    final_winner.id = 3
-    initiator_id = 4  # Инициатор перевыбора
 
     # Mock GameResult
-    mock_game_result = MagicMock()
-    mock_game_result.winner_id = old_winner.id
-    mock_game_result.reroll_available = True
-    mock_game_result.game_id = game_id
-    mock_game_result.year = year
-    mock_game_result.day = day
-
-    # Mock database queries
-    def exec_side_effect(stmt):
-        mock_result = MagicMock()
-        if not hasattr(exec_side_effect, 'call_count'):
-            exec_side_effect.call_count = 0
-        exec_side_effect.call_count += 1
-
-        if exec_side_effect.call_count == 1:
-            # First call - get GameResult
-            mock_result.first.return_value = mock_game_result
-        elif exec_side_effect.call_count == 2:
-            # Second call - get old winner
-            mock_result.first.return_value = old_winner
-
-        return mock_result
-
-    mock_context.db_session.exec.side_effect = exec_side_effect
-
-    # Mock config
-    mock_get_config = mocker.patch('bot.handlers.game.reroll_service.get_config_by_game_id')
-    mock_config = MagicMock()
-    mock_config.constants.reroll_enabled = True
-    mock_config.constants.reroll_price = REROLL_PRICE
-    mock_config.constants.coins_per_win = COINS_PER_WIN
-    mock_get_config.return_value = mock_config
-
-    # Mock coin operations
-    mock_spend = mocker.patch('bot.handlers.game.reroll_service.spend_coins')
-    mock_add = mocker.patch('bot.handlers.game.reroll_service.add_coins')
-    mock_select = mocker.patch('bot.handlers.game.selection_service.select_winner_with_effects')
-    mocker.patch('bot.handlers.game.prediction_service.process_predictions_for_reroll', return_value=[])
-
-    # Mock selection result: защита сработала, перевыбран другой игрок
-    # immunity_buyer_id=None — старое поведение без покупателя (обратная совместимость)
-    mock_selection_result = MagicMock()
-    mock_selection_result.winner = final_winner
-    mock_selection_result.all_protected = False
-    mock_selection_result.had_immunity = True  # Защита сработала!
-    mock_selection_result.protected_player = protected_player
-    mock_selection_result.immunity_buyer_id = None  # Нет покупателя — только базовая награда
-    mock_select.return_value = mock_selection_result
-
-    # Mock config with immunity_buyer_reward
-    mock_config.constants.immunity_buyer_reward = 30
-
-    # Execute reroll
-    old_winner_result, new_winner_result, selection_result = execute_reroll(
-        mock_context.db_session, game_id, year, day, initiator_id, sample_players, current_date
-    )
-
-    # Verify results
-    assert old_winner_result == old_winner
-    assert new_winner_result == final_winner
-
-    # Verify coins were spent from initiator
-    mock_spend.assert_called_once_with(
-        mock_context.db_session, game_id, initiator_id, REROLL_PRICE, year, "reroll", auto_commit=False
-    )
+    game_result = MagicMock()
+    game_result.winner_id = old_winner.id
+    game_result.reroll_available = True
+    game_result.game_id = _REROLL_GAME_ID
+    game_result.year = _REROLL_YEAR
+    game_result.day = _REROLL_DAY
+
+    # Database queries: GameResult first, then the old winner; any extra exec() fails the test
+    mock_context.db_session.exec.side_effect = [
+        SimpleNamespace(first=lambda: game_result),
+        SimpleNamespace(first=lambda: old_winner),
+    ]
 
-    # Verify coins were added to protected player (immunity reward) and final winner
-    # No buyer reward since immunity_buyer_id=None
-    assert mock_add.call_count == 2
-    mock_add.assert_any_call(
-        mock_context.db_session, game_id, protected_player.id, COINS_PER_WIN, year, "immunity_save_reroll", auto_commit=False
-    )
-    mock_add.assert_any_call(
-        mock_context.db_session, game_id, final_winner.id, COINS_PER_WIN, year, "pidor_win_reroll", auto_commit=False
+    return SimpleNamespace(
+        game_result=game_result,
+        spend=mocker.patch('bot.handlers.game.reroll_service.spend_coins'),
+        add=mocker.patch('bot.handlers.game.reroll_service.add_coins'),
+        select=mocker.patch('bot.handlers.game.selection_service.select_winner_with_effects'),
+        process_predictions=mocker.patch(
+            'bot.handlers.game.prediction_service.process_predictions_for_reroll', return_value=[]
+        ),
     )
 
-    # Verify GameResult was updated
-    assert mock_game_result.original_winner_id == old_winner.id
-    assert mock_game_result.winner_id == final_winner.id
-    assert mock_game_result.reroll_available is False
-    assert mock_game_result.reroll_initiator_id == initiator_id
-
-    # Verify commit was called
-    mock_context.db_session.commit.assert_called_once()
-
 
-@pytest.mark.asyncio
 @pytest.mark.integration
-async def test_reroll_with_double_chance(mock_update, mock_context, mock_game, sample_players, mocker):
-    """Integration test: full scenario with double chance during reroll."""
-    from datetime import date
-    from bot.handlers.game.reroll_service import execute_reroll
-
-    # Setup
-    game_id = 1
-    year = 2024
-    day = 100
-    current_date = date(2024, 4, 10)
-
-    # Игроки: [0] - старый победитель, [1] - победитель с двойным шансом
+@pytest.mark.parametrize("scenario", [
+    # Защита сработала, перевыбран другой игрок; без покупателя — только базовая награда
+    pytest.param(_RerollScenario(winner_index=2, had_immunity=True, protected_index=1), id="immunity_protection"),
+    pytest.param(_RerollScenario(winner_index=1, had_double_chance=True), id="double_chance"),
+    # Предсказание нового победителя сбылось при перевыборе
+    pytest.param(_RerollScenario(winner_index=1, prediction_hit=True), id="predictions"),
+])
+def test_execute_reroll(mock_context, sample_players, reroll_config, reroll_env, scenario):
+    """Integration test: reroll spends the initiator's coins, rewards the new winner and updates GameResult."""
+    session = mock_context.db_session
     old_winner = sample_players[0]
-    old_winner.id = 1
-    double_chance_winner = sample_players[1]
-    double_chance_winner.id = 2
-    initiator_id = 3
-
-    # Mock GameResult
-    mock_game_result = MagicMock()
-    mock_game_result.winner_id = old_winner.id
-    mock_game_result.reroll_available = True
-    mock_game_result.game_id = game_id
-    mock_game_result.year = year
-    mock_game_result.day = day
-
-    # Mock database queries
-    def exec_side_effect(stmt):
-        mock_result = MagicMock()
-        if not hasattr(exec_side_effect, 'call_count'):
-            exec_side_effect.call_count = 0
-        exec_side_effect.call_count += 1
-
-        if exec_side_effect.call_count == 1:
-            mock_result.first.return_value = mock_game_result
-        elif exec_side_effect.call_count == 2:
-            mock_result.first.return_value = old_winner
-
-        return mock_result
-
-    mock_context.db_session.exec.side_effect = exec_side_effect
-
-    # Mock config
-    mock_get_config = mocker.patch('bot.handlers.game.reroll_service.get_config_by_game_id')
-    mock_config = MagicMock()
-    mock_config.constants.reroll_enabled = True
-    mock_config.constants.reroll_price = REROLL_PRICE
-    mock_config.constants.coins_per_win = COINS_PER_WIN
-    mock_get_config.return_value = mock_config
-
-    # Mock coin operations
-    mock_spend = mocker.patch('bot.handlers.game.reroll_service.spend_coins')
-    mock_add = mocker.patch('bot.handlers.game.reroll_service.add_coins')
-    mock_select = mocker.patch('bot.handlers.game.selection_service.select_winner_with_effects')
-    mocker.patch('bot.handlers.game.prediction_service.process_predictions_for_reroll', return_value=[])
-
-    # Mock selection result: победитель с двойным шансом
-    mock_selection_result = MagicMock()
-    mock_selection_result.winner = double_chance_winner
-    mock_selection_result.all_protected = False
-    mock_selection_result.had_immunity = False
-    mock_selection_result.had_double_chance = True  # Двойной шанс сработал!
-    mock_selection_result.protected_player = None
-    mock_select.return_value = mock_selection_result
-
-    # Execute reroll
-    old_winner_result, new_winner_result, selection_result = execute_reroll(
-        mock_context.db_session, game_id, year, day, initiator_id, sample_players, current_date
-    )
-
-    # Verify results
-    assert old_winner_result == old_winner
-    assert new_winner_result == double_chance_winner
+    new_winner = sample_players[scenario.winner_index]
+    protected_player = None if scenario.protected_index is None else sample_players[scenario.protected_index]
+    initiator_id = 4  # Инициатор перевыбора
 
-    # Verify coins were spent from initiator
-    mock_spend.assert_called_once_with(
-        mock_context.db_session, game_id, initiator_id, REROLL_PRICE, year, "reroll", auto_commit=False
+    reroll_config.constants.immunity_buyer_reward = 30
+    reroll_env.select.return_value = SelectionResult(
+        winner=new_winner,
+        had_immunity=scenario.had_immunity,
+        had_double_chance=scenario.had_double_chance,
+        all_protected=False,
+        protected_player=protected_player,
     )
-
-    # Verify coins were added only to new winner (no immunity reward)
-    assert mock_add.call_count == 1
-    mock_add.assert_called_with(
-        mock_context.db_session, game_id, double_chance_winner.id, COINS_PER_WIN, year, "pidor_win_reroll", auto_commit=False
+    if scenario.prediction_hit:
+        prediction = Prediction(
+            game_id=_REROLL_GAME_ID, user_id=5, predicted_user_ids=f'[{new_winner.id}]',
+            year=_REROLL_YEAR, day=_REROLL_DAY, is_correct=False,
+        )
+        reroll_env.process_predictions.return_value = [(prediction, True)]
+
+    old_winner_result, new_winner_result, _selection_result = execute_reroll(
+        session, _REROLL_GAME_ID, _REROLL_YEAR, _REROLL_DAY, initiator_id, sample_players,
+        date(2024, 4, 10)  # День 100 в 2024 году
     )
 
-    # Verify GameResult was updated
-    assert mock_game_result.original_winner_id == old_winner.id
-    assert mock_game_result.winner_id == double_chance_winner.id
-    assert mock_game_result.reroll_available is False
-
-    # Verify commit was called
-    mock_context.db_session.commit.assert_called_once()
-
-
-@pytest.mark.asyncio
-@pytest.mark.integration
-async def test_reroll_with_predictions(mock_update, mock_context, mock_game, sample_players, mocker):
-    """Integration test: full scenario with predictions during reroll."""
-    from datetime import date
-    from bot.handlers.game.reroll_service import execute_reroll
-    from bot.app.models import Prediction
-
-    # Setup
-    game_id = 1
-    year = 2024
-    day = 100
-    current_date = date(2024, 4, 10)
-
-    # Игроки: [0] - старый победитель, [1] - новый победитель
-    old_winner = sample_players[0]
-    old_winner.id = 1
-    new_winner = sample_players[1]
-    new_winner.id = 2
-    initiator_id = 3
-    predictor_id = 4  # Игрок, который сделал предсказание
-
-    # Mock GameResult
-    mock_game_result = MagicMock()
-    mock_game_result.winner_id = old_winner.id
-    mock_game_result.reroll_available = True
-    mock_game_result.game_id = game_id
-    mock_game_result.year = year
-    mock_game_result.day = day
-
-    # Mock prediction - предсказал нового победителя
-    mock_prediction = MagicMock(spec=Prediction)
-    mock_prediction.user_id = predictor_id
-    mock_prediction.game_id = game_id
-    mock_prediction.year = year
-    mock_prediction.day = day
-    mock_prediction.predicted_user_ids = f'[{new_winner.id}]'  # Предсказал нового победителя
-    mock_prediction.is_correct = False  # Было неправильным для старого победителя
-
-    # Mock database queries
-    def exec_side_effect(stmt):
-        mock_result = MagicMock()
-        if not hasattr(exec_side_effect, 'call_count'):
-            exec_side_effect.call_count = 0
-        exec_side_effect.call_count += 1
-
-        if exec_side_effect.call_count == 1:
-            mock_result.first.return_value = mock_game_result
-        elif exec_side_effect.call_count == 2:
-            mock_result.first.return_value = old_winner
-
-        return mock_result
-
-    mock_context.db_session.exec.side_effect = exec_side_effect
-
-    # Mock config
-    mock_get_config = mocker.patch('bot.handlers.game.reroll_service.get_config_by_game_id')
-    mock_config = MagicMock()
-    mock_config.constants.reroll_enabled = True
-    mock_config.constants.reroll_price = REROLL_PRICE
-    mock_config.constants.coins_per_win = COINS_PER_WIN
-    mock_get_config.return_value = mock_config
-
-    # Mock coin operations and predictions
-    mock_spend = mocker.patch('bot.handlers.game.reroll_service.spend_coins')
-    mock_add = mocker.patch('bot.handlers.game.reroll_service.add_coins')
-    mock_select = mocker.patch('bot.handlers.game.selection_service.select_winner_with_effects')
-    mock_process_predictions = mocker.patch('bot.handlers.game.prediction_service.process_predictions_for_reroll')
-
-    # Mock selection result
-    mock_selection_result = MagicMock()
-    mock_selection_result.winner = new_winner
-    mock_selection_result.all_protected = False
-    mock_selection_result.had_immunity = False
-    mock_selection_result.had_double_chance = False
-    mock_selection_result.protected_player = None
-    mock_select.return_value = mock_selection_result
-
-    # Mock predictions processing - предсказание сбылось при перевыборе
-    mock_process_predictions.return_value = [(mock_prediction, True)]
-
-    # Execute reroll
-    old_winner_result, new_winner_result, selection_result = execute_reroll(
-        mock_context.db_session, game_id, year, day, initiator_id, sample_players, current_date
-    )
-
-    # Verify results
     assert old_winner_result == old_winner
     assert new_winner_result == new_winner
 
-    # Verify coins were spent from initiator
-    mock_spend.assert_called_once_with(
-        mock_context.db_session, game_id, initiator_id, REROLL_PRICE, year, "reroll", auto_commit=False
+    # Coins were spent from initiator
+    reroll_env.spend.assert_called_once_with(
+        session, _REROLL_GAME_ID, initiator_id, REROLL_PRICE, _REROLL_YEAR, "reroll", auto_commit=False
     )
 
-    # Verify coins were added to new winner
-    assert mock_add.call_count == 1
-    mock_add.assert_called_with(
-        mock_context.db_session, game_id, new_winner.id, COINS_PER_WIN, year, "pidor_win_reroll", auto_commit=False
+    # Protected player is rewarded first (no buyer reward without immunity_buyer_id), then the new winner
+    expected_adds = []
+    if protected_player is not None:
+        expected_adds.append(call(
+            session, _REROLL_GAME_ID, protected_player.id, COINS_PER_WIN, _REROLL_YEAR,
+            "immunity_save_reroll", auto_commit=False
+        ))
+    expected_adds.append(call(
+        session, _REROLL_GAME_ID, new_winner.id, COINS_PER_WIN, _REROLL_YEAR, "pidor_win_reroll", auto_commit=False
+    ))
+    assert reroll_env.add.call_args_list == expected_adds
+
+    # Predictions are processed for the new winner
+    reroll_env.process_predictions.assert_called_once_with(
+        session, _REROLL_GAME_ID, _REROLL_YEAR, _REROLL_DAY, new_winner.id
     )
 
-    # Verify predictions were processed for new winner
-    mock_process_predictions.assert_called_once_with(
-        mock_context.db_session, game_id, year, day, new_winner.id
-    )
-
-    # Verify GameResult was updated
-    assert mock_game_result.original_winner_id == old_winner.id
-    assert mock_game_result.winner_id == new_winner.id
-    assert mock_game_result.reroll_available is False
+    # GameResult was updated
+    game_result = reroll_env.game_result
+    assert game_result.original_winner_id == old_winner.id
+    assert game_result.winner_id == new_winner.id
+    assert game_result.reroll_available is False
+    assert game_result.reroll_initiator_id == initiator_id
 
-    # Verify commit was called
-    mock_context.db_session.commit.assert_called_once()
+    session.commit.assert_called_once()
 
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_give_coins_button_appears_after_pidor_selection(mock_update, mock_context, mock_game, sample_players, mocker):
+@pytest.mark.freeze_at("2026-01-29T12:00")
+async def test_give_coins_button_appears_after_pidor_selection(mock_update, mock_context, mock_game, sample_players, mocker,
+                                                               patched_now):
     """Интеграционный тест: кнопка 'Дайте койнов' появляется после выбора пидора дня."""
     from bot.handlers.game.commands import pidor_cmd
     from bot.handlers.game.text_static import GIVE_COINS_BUTTON_TEXT
 
-    # Mock asyncio.sleep
-    mocker.patch('asyncio.sleep', new_callable=AsyncMock)
-
     # Mock random.choice для выбора победителя
     mock_choice = mocker.patch('bot.handlers.game.commands.random.choice')
     winner = sample_players[0]
-    mock_choice.side_effect = [
-        winner,  # winner
-        "Stage 1",
-        "Stage 2",
-        "Stage 3",
-        "Stage 4: {username}",
-    ]
-
-    # Mock datetime
-    mock_dt = MagicMock()
-    mock_dt.year = 2026
-    mock_dt.month = 1
-    mock_dt.day = 29
-    mock_dt.timetuple.return_value.tm_yday = 29
-    mock_dt.date.return_value = MagicMock()
-    mocker.patch('bot.handlers.game.commands.current_datetime', return_value=mock_dt)
+    mock_choice.side_effect = (winner, *_STAGE_PHRASES)
 
     # Setup game with players
     mock_game.players = sample_players
@@ -498,23 +266,14 @@ async def test_give_coins_button_appears_after_pidor_selection(mock_update, mock
     mock_context.tg_user = sample_players[1]
 
     # Mock query chain
-    mock_game_query = MagicMock()
-    mock_game_query.filter_by.return_value = mock_game_query
-    mock_game_query.one_or_none.return_value = mock_game
-
-    mock_missed_query = MagicMock()
-    mock_missed_query.filter_by.return_value = mock_missed_query
-    mock_missed_query.order_by.return_value = mock_missed_query
-    mock_missed_query.first.return_value = None
-
     mock_result_query = MagicMock()
     mock_result_query.filter_by.return_value = mock_result_query
     mock_result_query.one_or_none.return_value = None
     mock_result_query.one.return_value = MagicMock(winner_id=winner.id)
 
     mock_context.db_session.query.side_effect = [
-        mock_game_query,
-        mock_missed_query,
+        FakeQuery(mock_game),
+        FakeQuery(None),  # no previous games (missed days)
         mock_result_query,
         mock_result_query
     ]
@@ -527,6 +286,7 @@ async def test_give_coins_button_appears_after_pidor_selection(mock_update, mock
 
     # Verify send_result_with_reroll_button was called
     assert mock_send_result.called
+    assert mock_choice.call_count == 1 + len(_STAGE_PHRASES)
     call_args = mock_send_result.call_args
 
     # Проверяем, что функция была вызвана с правильными параметрами
@@ -543,10 +303,6 @@ async def test_give_coins_button_appears_after_pidor_selection(mock_update, mock
 async def test_give_coins_regular_player_gets_1_coin(mock_update, mock_context, mock_game, sample_players, mocker):
     """Интеграционный тест: обычный игрок получает 1 койн."""
     from bot.handlers.game.commands import handle_give_coins_callback
-    from bot.handlers.game.config import GameConstants
-
-    # Получаем значение по умолчанию из конфигурации
-    GIVE_COINS_AMOUNT = GameConstants().give_coins_amount
 
     # Setup
     winner = sample_players[0]
@@ -558,10 +314,7 @@ async def test_give_coins_regular_player_gets_1_coin(mock_update, mock_context,
     mock_context.tg_user = regular_player
 
     # Mock query для ensure_game decorator
-    mock_game_query = MagicMock()
-    mock_game_query.filter_by.return_value = mock_game_query
-    mock_game_query.one_or_none.return_value = mock_game
-    mock_context.db_session.query.return_value = mock_game_query
+    mock_context.db_session.query.return_value = FakeQuery(mock_game)
 
     # Mock callback query
     query = MagicMock()
@@ -582,7 +335,7 @@ async def test_give_coins_regular_player_gets_1_coin(mock_update, mock_context,
     mock_config = MagicMock()
     mock_config.constants.give_coins_enabled = True
     mock_config.constants.give_coins_amount = GIVE_COINS_AMOUNT
-    mock_config.constants.give_coins_winner_amount = GameConstants().give_coins_winner_amount
+    mock_config.constants.give_coins_winner_amount = GIVE_COINS_WINNER_AMOUNT
     mocker.patch('bot.handlers.game.give_coins_service.get_config_by_game_id', return_value=mock_config)
 
     # Execute
@@ -607,10 +360,6 @@ async def test_give_coins_regular_player_gets_1_coin(mock_update, mock_context,
 async def test_give_coins_winner_gets_2_coins(mock_update, mock_context, mock_game, sample_players, mocker):
     """Интеграционный тест: пидор дня получает 2 койна."""
     from bot.handlers.game.commands import handle_give_coins_callback
-    from bot.handlers.game.config import GameConstants
-
-    # Получаем значение по умолчанию из конфигурации
-    GIVE_COINS_WINNER_AMOUNT = GameConstants().give_coins_winner_amount
 
     # Setup
     winner = sample_players[0]
@@ -621,10 +370,7 @@ async def test_give_coins_winner_gets_2_coins(mock_update, mock_context, mock_ga
     mock_context.tg_user = winner
 
     # Mock query для ensure_game decorator
-    mock_game_query = MagicMock()
-    mock_game_query.filter_by.return_value = mock_game_query
-    mock_game_query.one_or_none.return_value = mock_game
-    mock_context.db_session.query.return_value = mock_game_query
+    mock_context.db_session.query.return_value = FakeQuery(mock_game)
 
     # Mock callback query
     query = MagicMock()
@@ -644,7 +390,7 @@ async def test_give_coins_winner_gets_2_coins(mock_update, mock_context, mock_ga
     # Mock get_config_by_game_id
     mock_config = MagicMock()
     mock_config.constants.give_coins_enabled = True
-    mock_config.constants.give_coins_amount = GameConstants().give_coins_amount
+    mock_config.constants.give_coins_amount = GIVE_COINS_AMOUNT
     mock_config.constants.give_coins_winner_amount = GIVE_COINS_WINNER_AMOUNT
     mocker.patch('bot.handlers.game.give_coins_service.get_config_by_game_id', return_value=mock_config)
 
@@ -685,10 +431,7 @@ async def test_give_coins_cannot_claim_twice(mock_update, mock_context, mock_gam
     mock_context.tg_user = regular_player
 
     # Mock query для ensure_game decorator
-    mock_game_query = MagicMock()
-    mock_game_query.filter_by.return_value = mock_game_query
-    mock_game_query.one_or_none.return_value = mock_game
-    mock_context.db_session.query.return_value = mock_game_query
+    mock_context.db_session.query.return_value = FakeQuery(mock_game)
 
     # Mock callback query
     query = MagicMock()
@@ -698,10 +441,7 @@ async def test_give_coins_cannot_claim_twice(mock_update, mock_context, mock_gam
     mock_update.callback_query = query
 
     # Mock has_claimed_today - уже получал
-    mock_click = MagicMock()
-    mock_result = MagicMock()
-    mock_result.first.return_value = mock_click
-    mock_context.db_session.exec.return_value = mock_result
+    mock_context.db_session.exec.return_value = SimpleNamespace(first=lambda: _CLICK)
 
     # Execute
     await handle_give_coins_callback(mock_update, mock_context)
@@ -736,10 +476,7 @@ async def test_give_coins_unregistered_player_error(mock_update, mock_context, m
     mock_context.tg_user = unregistered_player
 
     # Mock query для ensure_game decorator
-    mock_game_query = MagicMock()
-    mock_game_query.filter_by.return_value = mock_game_query
-    mock_game_query.one_or_none.return_value = mock_game
-    mock_context.db_session.query.return_value = mock_game_query
+    mock_context.db_session.query.return_value = FakeQuery(mock_game)
 
     # Mock callback query
     query = MagicMock()
@@ -12,9 +12,16 @@ from bot.handlers.game.commands import (
     handle_vote_callback,
     pidorfinalclose_cmd
 )
+from bot.handlers.game.voting_helpers import finalize_voting
 from bot.app.models import FinalVoting, GameResult
 
 
+def _sent_text(mock_send):
+    """Return the text of the last sent message."""
+    call = mock_send.call_args
+    return call.args[0] if call.args else call.kwargs.get('text', '')
+
+
 @pytest.mark.asyncio
 @pytest.mark.integration
 async def test_full_final_voting_cycle(mock_update, mock_context, mock_game, sample_players, mocker):
@@ -48,8 +55,8 @@ async def test_full_final_voting_cycle(mock_update, mock_context, mock_game, sam
 
     # Verify "not started" message
     assert mock_update.effective_chat.send_message.call_count == 1
-    call_args = str(mock_update.effective_chat.send_message.call_args)
-    assert "не запущено" in call_args or "not started" in call_args.lower()
+    message = _sent_text(mock_update.effective_chat.send_message)
+    assert "не запущено" in message or "not started" in message.lower()
 
     # Reset mocks
     mock_update.effective_chat.send_message.reset_mock()
@@ -106,8 +113,8 @@ async def test_full_final_voting_cycle(mock_update, mock_context, mock_game, sam
 
     # Verify "active" message
     assert mock_update.effective_chat.send_message.call_count == 1
-    call_args = str(mock_update.effective_chat.send_message.call_args)
-    assert "активно" in call_args or "active" in call_args.lower()
+    message = _sent_text(mock_update.effective_chat.send_message)
+    assert "активно" in message or "active" in message.lower()
 
     # Reset mocks
     mock_update.effective_chat.send_message.reset_mock()
@@ -139,8 +146,8 @@ async def test_full_final_voting_cycle(mock_update, mock_context, mock_game, sam
 
     # Verify "completed" message
     assert mock_update.effective_chat.send_message.call_count == 1
-    call_args = str(mock_update.effective_chat.send_message.call_args)
-    assert "завершено" in call_args or "completed" in call_args.lower()
+    message = _sent_text(mock_update.effective_chat.send_message)
+    assert "завершено" in message or "completed" in message.lower()
 
 
 @pytest.mark.asyncio
@@ -175,8 +182,8 @@ async def test_missed_days_and_final_voting(mock_update, mock_context, mock_game
 
     # Verify missed days message was sent
     assert mock_update.effective_chat.send_message.call_count == 1
-    call_args = str(mock_update.effective_chat.send_message.call_args)
-    assert "5" in call_args  # Should show count of missed days
+    message = _sent_text(mock_update.effective_chat.send_message)
+    assert "5" in message  # Should show count of missed days
 
     # Reset mocks
     mock_update.effective_chat.send_message.reset_mock()
@@ -312,7 +319,7 @@ async def test_multiple_games_final_voting(mock_update, mock_context, sample_pla
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_custom_voting_full_cycle(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_custom_voting_full_cycle(mock_update, mock_context, mock_game, sample_players, mocker, allowed_closers):
     """Test full custom voting cycle: create → vote → close → verify results."""
     # Setup game with players
     mock_game.players = sample_players
@@ -462,9 +469,6 @@ async def test_custom_voting_full_cycle(mock_update, mock_context, mock_game, sa
     # Mock context.tg_user.full_username() to return test_admin
     mock_context.tg_user.full_username.return_value = 'test_admin'
 
-    # Mock get_allowed_final_voting_closers to return test_admin
-    mocker.patch('bot.handlers.game.commands.get_allowed_final_voting_closers', return_value=['test_admin'])
-
     # Mock admin check
     mock_chat_member = MagicMock()
     mock_chat_member.status = 'administrator'
@@ -580,8 +584,8 @@ async def test_full_voting_cycle_with_improvements(mock_update, mock_context, mo
 
     # Verify voting was created with correct max_votes (6 days → 3 votes)
     mock_context.bot.send_message.assert_called_once()
-    call_args = str(mock_context.bot.send_message.call_args)
-    assert "Максимум *3* выборов" in call_args
+    message = _sent_text(mock_context.bot.send_message)
+    assert "Максимум *3* выборов" in message
 
     # Reset mocks
     mock_context.bot.send_message.reset_mock()
@@ -601,8 +605,8 @@ async def test_full_voting_cycle_with_improvements(mock_update, mock_context, mo
 
     # Verify status shows voter count
     mock_update.effective_chat.send_message.assert_called_once()
-    call_args = str(mock_update.effective_chat.send_message.call_args)
-    assert "Проголосовало: 1" in call_args
+    message = _sent_text(mock_update.effective_chat.send_message)
+    assert "Проголосовало: 1" in message
 
     # Reset mocks
     mock_update.effective_chat.send_message.reset_mock()
@@ -635,9 +639,6 @@ async def test_full_voting_cycle_with_improvements(mock_update, mock_context, mo
     mock_final_voting.ended_at = None
     mock_final_voting.votes_data = '{"100000001": [1, 2]}'  # Only user 1 voted (using tg_id)
 
-    # Mock finalize_voting call
-    from bot.handlers.game.voting_helpers import finalize_voting
-
     # Mock player weights for finalize_voting
     mock_weights_for_finalize = MagicMock()
     weights_result = [(1, 100000001, 6), (2, 100000002, 4), (3, 100000003, 2)]  # user_id, tg_id, weight
@@ -789,8 +790,8 @@ async def test_final_voting_full_cycle_with_single_exclusion(mock_update, mock_c
     mock_context.bot.send_message.assert_called_once()
 
     # Verify message contains exclusion info
-    call_args = str(mock_context.bot.send_message.call_args)
-    assert "НЕ УЧАСТВУЕТ" in call_args or "лидер года" in call_args
+    message = _sent_text(mock_context.bot.send_message)
+    assert "НЕ УЧАСТВУЕТ" in message or "лидер года" in message
 
     # Verify FinalVoting was saved with excluded_leaders_data
     add_call = mock_context.db_session.add.call_args
@@ -857,19 +858,19 @@ async def test_final_voting_full_cycle_with_multiple_exclusions(mock_update, moc
     mock_context.bot.send_message.assert_called_once()
 
     # Verify message contains exclusion info for MULTIPLE leaders
-    call_args = str(mock_context.bot.send_message.call_args)
-    assert "НЕ УЧАСТВУЕТ" in call_args
-    assert "лидер" in call_args.lower()
+    message = _sent_text(mock_context.bot.send_message)
+    assert "НЕ УЧАСТВУЕТ" in message
+    assert "лидер" in message.lower()
     # Should mention both excluded leaders
-    assert sample_players[0].first_name in call_args
-    assert sample_players[1].first_name in call_args
+    assert sample_players[0].first_name in message
+    assert sample_players[1].first_name in message
 
     mock_context.db_session.commit.assert_called()
 
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_final_voting_proportional_distribution_integration(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_final_voting_proportional_distribution_integration(mock_update, mock_context, mock_game, sample_players, mocker, allowed_closers):
     """Test proportional distribution in full voting cycle."""
     # Setup game with players
     mock_game.players = sample_players
@@ -912,9 +913,6 @@ async def test_final_voting_proportional_distribution_integration(mock_update, m
     # Mock context.tg_user.full_username() to return test_admin
     mock_context.tg_user.full_username.return_value = 'test_admin'
 
-    # Mock get_allowed_final_voting_closers to return test_admin
-    mocker.patch('bot.handlers.game.commands.get_allowed_final_voting_closers', return_value=['test_admin'])
-
     mock_chat_member = MagicMock()
     mock_chat_member.status = 'administrator'
     mock_context.bot.get_chat_member = AsyncMock(return_value=mock_chat_member)
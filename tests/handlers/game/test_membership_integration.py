@@ -10,6 +10,9 @@ from bot.handlers.game.text_static import (
     ERROR_ALREADY_REGISTERED,
 )
 
+# Паузы между этапами pidor_cmd заглушены для всего модуля
+pytestmark = pytest.mark.usefixtures("no_sleep")
+
 
 @pytest.fixture
 def make_tg_user():
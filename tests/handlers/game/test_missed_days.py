@@ -14,6 +14,9 @@ from bot.handlers.game.text_static import (
     MISSED_DAYS_8_14, MISSED_DAYS_15_30, MISSED_DAYS_31_PLUS
 )
 
+# Паузы между этапами pidor_cmd заглушены для всего модуля
+pytestmark = pytest.mark.usefixtures("no_sleep")
+
 
 @pytest.mark.unit
 def test_get_missed_days_count_no_previous_games(mock_context, mock_game):
@@ -185,9 +188,6 @@ async def test_pidor_cmd_with_missed_days(mock_update, mock_context, mock_game,
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('asyncio.sleep', new_callable=AsyncMock)
-
     # Mock current_datetime
     mock_dt = MagicMock()
     mock_dt.year = 2024
@@ -250,9 +250,6 @@ async def test_pidor_cmd_no_missed_days(mock_update, mock_context, mock_game, sa
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('asyncio.sleep', new_callable=AsyncMock)
-
     # Mock current_datetime
     mock_dt = MagicMock()
     mock_dt.year = 2024
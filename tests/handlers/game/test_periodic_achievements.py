@@ -12,6 +12,9 @@ from bot.handlers.game.achievement_service import (
 )
 from bot.app.models import UserAchievement, GameResult, PidorCoinTransaction
 
+# Паузы между этапами pidor_cmd заглушены для всего модуля
+pytestmark = pytest.mark.usefixtures("no_sleep")
+
 
 @pytest.mark.unit
 def test_get_previous_month_january():
@@ -386,7 +389,7 @@ async def test_monthly_achievements_awarded_on_first_game(
     mock_game,
     sample_players,
     mocker
-):
+, patch_player_effects):
     """Integration test: monthly achievements awarded on first game of new month."""
     from bot.handlers.game.commands import pidor_cmd
     from bot.handlers.game.config import GameConstants
@@ -430,12 +433,9 @@ async def test_monthly_achievements_awarded_on_first_game(
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep', new_callable=AsyncMock)
-
-    # Mock get_or_create_player_effects
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects',
-                 return_value=MagicMock(immunity_year=None, immunity_day=None))
+    # Mock player effects (no immunity)
+    no_effects = MagicMock(immunity_year=None, immunity_day=None)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
 
     # Mock is_first_game_of_month to return True
     mocker.patch('bot.handlers.game.achievement_service.is_first_game_of_month',
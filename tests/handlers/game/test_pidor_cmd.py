@@ -9,6 +9,9 @@ from bot.handlers.game.text_static import (
 )
 from bot.handlers.game.voting_helpers import get_player_weights, get_year_leaders
 
+# Паузы между этапами pidor_cmd заглушены для всего модуля
+pytestmark = pytest.mark.usefixtures("no_sleep")
+
 
 @pytest.mark.asyncio
 @pytest.mark.unit
@@ -110,9 +113,6 @@ async def test_pidor_cmd_new_game_result(mock_update, mock_context, mock_game, s
         "Stage 4 message: {username}",  # stage4 phrase
     ])
 
-    # Mock asyncio.sleep to avoid delays
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -172,9 +172,6 @@ async def test_pidor_cmd_last_day_of_year(mock_update, mock_context, mock_game,
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -242,9 +239,6 @@ async def test_pidor_cmd_random_winner_selection(mock_update, mock_context, mock
         "Stage 4: {username}",
     ]
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -262,12 +256,12 @@ async def test_pidor_cmd_random_winner_selection(mock_update, mock_context, mock
     # Verify random.choice was called with players list
     assert mock_random_choice.call_count >= 1
     first_call_args = mock_random_choice.call_args_list[0][0]
-    assert first_call_args[0] == sample_players
+    assert list(first_call_args[0]) == sample_players
 
 
 @pytest.mark.asyncio
 @pytest.mark.unit
-async def test_pidor_cmd_time_delays(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_pidor_cmd_time_delays(mock_update, mock_context, mock_game, sample_players, mocker, no_sleep):
     """Test that time delays are called between messages."""
     # Setup
     mock_game.players = sample_players
@@ -299,9 +293,6 @@ async def test_pidor_cmd_time_delays(mock_update, mock_context, mock_game, sampl
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep and capture calls
-    mock_sleep = mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -318,8 +309,8 @@ async def test_pidor_cmd_time_delays(mock_update, mock_context, mock_game, sampl
 
     # Verify asyncio.sleep was called 4 times with GAME_RESULT_TIME_DELAY (2 seconds)
     # 1 for dramatic message + 3 for stages
-    assert mock_sleep.call_count == 4
-    for call in mock_sleep.call_args_list:
+    assert no_sleep.call_count == 4
+    for call in no_sleep.call_args_list:
         assert call[0][0] == 2  # GAME_RESULT_TIME_DELAY
 
 
@@ -408,9 +399,6 @@ async def test_run_tiebreaker_two_leaders(mock_update, mock_context, mock_game,
     # Mock random.choice to return first leader
     mock_random = mocker.patch('bot.handlers.game.commands.random.choice', return_value=leaders[0])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Execute
     await run_tiebreaker(mock_update, mock_context, leaders, year)
 
@@ -442,9 +430,6 @@ async def test_run_tiebreaker_three_leaders(mock_update, mock_context, mock_game
     # Mock random.choice to return second leader
     mock_random = mocker.patch('bot.handlers.game.commands.random.choice', return_value=leaders[1])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Execute
     await run_tiebreaker(mock_update, mock_context, leaders, year)
 
@@ -475,9 +460,6 @@ async def test_run_tiebreaker_creates_game_result(mock_update, mock_context, moc
     # Mock random.choice
     mocker.patch('bot.handlers.game.commands.random.choice', return_value=leaders[0])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Execute
     await run_tiebreaker(mock_update, mock_context, leaders, year)
 
@@ -505,9 +487,6 @@ async def test_run_tiebreaker_leap_year(mock_update, mock_context, mock_game, sa
     # Mock random.choice
     mocker.patch('bot.handlers.game.commands.random.choice', return_value=leaders[0])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Execute
     await run_tiebreaker(mock_update, mock_context, leaders, year)
 
@@ -554,9 +533,6 @@ async def test_pidor_cmd_last_day_triggers_tiebreaker(mock_update, mock_context,
         sample_players[1],  # winner of tie-breaker
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -621,9 +597,6 @@ async def test_pidor_cmd_last_day_single_leader_no_tiebreaker(mock_update, mock_
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -687,9 +660,6 @@ async def test_pidor_cmd_not_last_day_no_tiebreaker(mock_update, mock_context, m
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -754,9 +724,6 @@ async def test_pidor_cmd_awards_coins_to_winner_and_executor(mock_update, mock_c
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
@@ -887,9 +854,6 @@ async def test_pidor_cmd_self_pidor_case(mock_update, mock_context, mock_game, s
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock send_result_with_reroll_button
     mocker.patch('bot.handlers.game.commands.send_result_with_reroll_button', new_callable=AsyncMock)
 
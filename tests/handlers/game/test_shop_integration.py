@@ -3,14 +3,26 @@ import json
 import pytest
 from datetime import datetime, date, timedelta
 from unittest.mock import MagicMock, AsyncMock, patch
+from sqlalchemy.sql.dml import Update
 from bot.handlers.game.commands import pidor_cmd
 from bot.app.models import GamePlayerEffect, Prediction
 from bot.handlers.game.config import ChatConfig, GameConstants
 
+# Паузы между этапами pidor_cmd заглушены для всего модуля
+pytestmark = pytest.mark.usefixtures("no_sleep")
+
+
+def _apply_double_chance_reset(stmt, purchases):
+    """Apply the UPDATE issued by reset_double_chance to in-memory purchases of its target player."""
+    target_id = stmt.compile().params['target_id_1']
+    for purchase in purchases:
+        if purchase.target_id == target_id:
+            purchase.is_used = True
+
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_immunity_blocks_selection(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_immunity_blocks_selection(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that immunity blocks player selection and triggers reselection."""
     # Setup: game with 3 players, first player has active immunity
     mock_game.players = sample_players
@@ -57,7 +69,7 @@ async def test_immunity_blocks_selection(mock_update, mock_context, mock_game, s
             return effect1
         return GamePlayerEffect(game_id=game_id, user_id=user_id)
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', side_effect=mock_get_effects)
+    patch_player_effects(mock_get_effects)
 
     # Mock random.choice to first select protected player, then unprotected
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
@@ -69,9 +81,6 @@ async def test_immunity_blocks_selection(mock_update, mock_context, mock_game, s
         "Stage 4: {username}",
     ])
 
-    # Mock asyncio.sleep
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
-
     # Mock add_coins and get_balance
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
@@ -117,7 +126,7 @@ async def test_immunity_blocks_selection(mock_update, mock_context, mock_game, s
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_immunity_reselection(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_immunity_reselection(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that reselection happens when protected player is chosen."""
     # Setup: game with 3 players, first player has active immunity
     mock_game.players = sample_players
@@ -162,7 +171,7 @@ async def test_immunity_reselection(mock_update, mock_context, mock_game, sample
             return effect1
         return GamePlayerEffect(game_id=game_id, user_id=user_id)
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', side_effect=mock_get_effects)
+    patch_player_effects(mock_get_effects)
 
     # Mock random.choice - first protected, then unprotected
     mock_choice = mocker.patch('bot.handlers.game.commands.random.choice')
@@ -175,7 +184,6 @@ async def test_immunity_reselection(mock_update, mock_context, mock_game, sample
         "Stage 4: {username}",
     ]
 
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
 
@@ -200,7 +208,7 @@ async def test_immunity_reselection(mock_update, mock_context, mock_game, sample
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_immunity_message_shown(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_immunity_message_shown(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that immunity activation message is shown with coin information."""
     # Setup
     mock_game.players = sample_players
@@ -242,13 +250,12 @@ async def test_immunity_message_shown(mock_update, mock_context, mock_game, samp
             return effect1
         return GamePlayerEffect(game_id=game_id, user_id=user_id)
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', side_effect=mock_get_effects)
+    patch_player_effects(mock_get_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],
         sample_players[1],
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=14)  # 10 + 4 coins
 
@@ -278,7 +285,7 @@ async def test_immunity_message_shown(mock_update, mock_context, mock_game, samp
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_double_chance_increases_probability(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_double_chance_increases_probability(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that double chance increases probability of winning (statistical test)."""
     # Setup
     mock_game.players = sample_players
@@ -327,12 +334,15 @@ async def test_double_chance_increases_probability(mock_update, mock_context, mo
     def mock_exec_with_purchase(stmt):
         stmt_str = str(stmt)
         if 'doublechancepurchase' in stmt_str.lower():
+            if isinstance(stmt, Update):
+                _apply_double_chance_reset(stmt, mock_purchase_result.all.return_value)
             return mock_purchase_result
         return original_exec(stmt)
 
     mock_context.db_session.exec = mock_exec_with_purchase
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
 
     # Capture the selection pool passed to random.choice
     selection_pools = []
@@ -352,14 +362,13 @@ async def test_double_chance_increases_probability(mock_update, mock_context, mo
     original_random_choice = random.choice
 
     def mock_random_choice(seq):
-        if isinstance(seq, list) and len(seq) > 0 and hasattr(seq[0], 'id'):
+        if len(seq) > 0 and hasattr(seq[0], 'id'):
             # This is the player selection pool
             selection_pools.append(list(seq))
         return original_random_choice(seq)
 
     mocker.patch('random.choice', side_effect=mock_random_choice)
 
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
 
@@ -375,7 +384,7 @@ async def test_double_chance_increases_probability(mock_update, mock_context, mo
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_double_chance_resets_after_win(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_double_chance_resets_after_win(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that double chance is reset after player wins."""
     # Setup
     mock_game.players = sample_players
@@ -424,17 +433,19 @@ async def test_double_chance_resets_after_win(mock_update, mock_context, mock_ga
     def mock_exec_with_purchase(stmt):
         stmt_str = str(stmt)
         if 'doublechancepurchase' in stmt_str.lower():
+            if isinstance(stmt, Update):
+                _apply_double_chance_reset(stmt, mock_purchase_result.all.return_value)
             return mock_purchase_result
         return original_exec(stmt)
 
     mock_context.db_session.exec = mock_exec_with_purchase
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Winner with double chance
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
 
@@ -450,7 +461,7 @@ async def test_double_chance_resets_after_win(mock_update, mock_context, mock_ga
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_prediction_correct_awards_coins(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_prediction_correct_awards_coins(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that correct prediction awards 30 coins."""
     # This is a simplified integration test that verifies the prediction logic works
     # Full integration is tested in test_prediction_notification_sent
@@ -506,12 +517,12 @@ async def test_prediction_correct_awards_coins(mock_update, mock_context, mock_g
 
     mock_context.db_session.exec.side_effect = mock_exec_side_effect
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Winner - matches prediction
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
 
     # Mock add_coins in both commands and prediction_service (where it's actually called for predictions)
     mock_add_coins = mocker.patch('bot.handlers.game.commands.add_coins')
@@ -538,7 +549,7 @@ async def test_prediction_correct_awards_coins(mock_update, mock_context, mock_g
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_prediction_incorrect_no_reward(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_prediction_incorrect_no_reward(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that incorrect prediction does not award coins."""
     # Setup
     mock_game.players = sample_players
@@ -589,12 +600,12 @@ async def test_prediction_incorrect_no_reward(mock_update, mock_context, mock_ga
 
     mock_context.db_session.exec.side_effect = mock_exec_side_effect
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Winner - does NOT match prediction
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
 
     mock_add_coins = mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
@@ -615,7 +626,7 @@ async def test_prediction_incorrect_no_reward(mock_update, mock_context, mock_ga
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_prediction_notification_sent(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_prediction_notification_sent(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that prediction result notification is sent to predictor."""
     # This test verifies that the notification logic is called
     # The actual notification sending is complex due to query mocking
@@ -668,12 +679,12 @@ async def test_prediction_notification_sent(mock_update, mock_context, mock_game
 
     mock_context.db_session.exec.side_effect = mock_exec_side_effect
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=40)
 
@@ -692,7 +703,7 @@ async def test_prediction_notification_sent(mock_update, mock_context, mock_game
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_combined_effects(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_combined_effects(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test combination of immunity and double chance effects."""
     # Setup: Player 0 has immunity, Player 1 has double chance
     mock_game.players = sample_players
@@ -754,18 +765,19 @@ async def test_combined_effects(mock_update, mock_context, mock_game, sample_pla
     def mock_exec_with_purchase(stmt):
         stmt_str = str(stmt)
         if 'doublechancepurchase' in stmt_str.lower():
+            if isinstance(stmt, Update):
+                _apply_double_chance_reset(stmt, mock_purchase_result.all.return_value)
             return mock_purchase_result
         return original_exec(stmt)
 
     mock_context.db_session.exec = mock_exec_with_purchase
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', side_effect=mock_get_effects)
+    patch_player_effects(mock_get_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Protected player selected
         sample_players[1],  # Reselected - has double chance
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
 
@@ -790,7 +802,7 @@ async def test_combined_effects(mock_update, mock_context, mock_game, sample_pla
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_all_players_protected(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_all_players_protected(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test special message when all players are protected."""
     # Setup: All players have active immunity
     mock_game.players = sample_players
@@ -828,8 +840,7 @@ async def test_all_players_protected(mock_update, mock_context, mock_game, sampl
             immunity_day=167  # Today
         )
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', side_effect=mock_get_effects)
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
+    patch_player_effects(mock_get_effects)
 
     # Execute
     await pidor_cmd(mock_update, mock_context)
@@ -851,7 +862,7 @@ async def test_all_players_protected(mock_update, mock_context, mock_game, sampl
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_effects_isolated_between_games(mock_update, mock_context, sample_players, mocker):
+async def test_effects_isolated_between_games(mock_update, mock_context, sample_players, mocker, patch_player_effects):
     """Test that effects in one game do not affect another game (critical test!)."""
     from bot.app.models import Game
 
@@ -876,7 +887,7 @@ async def test_effects_isolated_between_games(mock_update, mock_context, sample_
         # For game2, return effect without immunity
         return GamePlayerEffect(game_id=game_id, user_id=user_id)
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', side_effect=mock_get_effects)
+    patch_player_effects(mock_get_effects)
 
     # Test game1 - player 0 should be protected
     mock_context.game = game1
@@ -909,7 +920,6 @@ async def test_effects_isolated_between_games(mock_update, mock_context, sample_
         sample_players[1],  # Reselected
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
 
@@ -982,7 +992,7 @@ async def test_effects_isolated_between_games(mock_update, mock_context, sample_
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_double_chance_for_other_player(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_double_chance_for_other_player(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that double chance can be bought for another player and works correctly."""
     # Setup
     mock_game.players = sample_players
@@ -1031,17 +1041,19 @@ async def test_double_chance_for_other_player(mock_update, mock_context, mock_ga
     def mock_exec_with_purchase(stmt):
         stmt_str = str(stmt)
         if 'doublechancepurchase' in stmt_str.lower():
+            if isinstance(stmt, Update):
+                _apply_double_chance_reset(stmt, mock_purchase_result.all.return_value)
             return mock_purchase_result
         return original_exec(stmt)
 
     mock_context.db_session.exec = mock_exec_with_purchase
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Winner with double chance bought by another player
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=10)
 
@@ -1061,7 +1073,7 @@ async def test_double_chance_for_other_player(mock_update, mock_context, mock_ga
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_predictions_summary_single_message(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_predictions_summary_single_message(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that predictions are shown in the unified stage4 message."""
     # Setup
     mock_game.players = sample_players
@@ -1112,12 +1124,12 @@ async def test_predictions_summary_single_message(mock_update, mock_context, moc
 
     mock_context.db_session.exec.side_effect = mock_exec_side_effect
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Winner matches prediction
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=40)
 
@@ -1141,7 +1153,7 @@ async def test_predictions_summary_single_message(mock_update, mock_context, moc
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_predictions_summary_multiple_correct(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_predictions_summary_multiple_correct(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that multiple correct predictions are shown in one summary."""
     # Setup
     mock_game.players = sample_players
@@ -1204,12 +1216,12 @@ async def test_predictions_summary_multiple_correct(mock_update, mock_context, m
 
     mock_context.db_session.exec.side_effect = mock_exec_side_effect
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Winner matches both predictions
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=40)
 
@@ -1226,7 +1238,7 @@ async def test_predictions_summary_multiple_correct(mock_update, mock_context, m
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_predictions_summary_mixed_results(mock_update, mock_context, mock_game, sample_players, mocker):
+async def test_predictions_summary_mixed_results(mock_update, mock_context, mock_game, sample_players, mocker, patch_player_effects):
     """Test that mixed prediction results (correct and incorrect) are shown in one summary."""
     # Setup
     mock_game.players = sample_players
@@ -1289,12 +1301,12 @@ async def test_predictions_summary_mixed_results(mock_update, mock_context, mock
 
     mock_context.db_session.exec.side_effect = mock_exec_side_effect
 
-    mocker.patch('bot.handlers.game.game_effects_service.get_or_create_player_effects', return_value=GamePlayerEffect(game_id=mock_game.id, user_id=0))
+    no_effects = GamePlayerEffect(game_id=mock_game.id, user_id=0)
+    patch_player_effects(lambda db_session, game_id, user_id: no_effects)
     mocker.patch('bot.handlers.game.commands.random.choice', side_effect=[
         sample_players[0],  # Winner - matches prediction1, not prediction2
         "Stage 1", "Stage 2", "Stage 3", "Stage 4: {username}",
     ])
-    mocker.patch('bot.handlers.game.commands.asyncio.sleep')
     mocker.patch('bot.handlers.game.commands.add_coins')
     mocker.patch('bot.handlers.game.commands.get_balance', return_value=40)
 
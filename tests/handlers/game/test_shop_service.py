@@ -5,6 +5,7 @@ from datetime import date, timedelta
 
 from bot.handlers.game.shop_service import (
     get_or_create_player_effects,
+    get_or_create_players_effects,
     spend_coins,
     can_afford,
     get_shop_items,
@@ -79,6 +80,72 @@ def test_get_or_create_player_effects_returns_existing(mock_db_session):
     mock_db_session.commit.assert_not_called()
 
 
+@pytest.mark.unit
+def test_get_or_create_players_effects_single_query(mock_db_session):
+    """Test get_or_create_players_effects loads existing records in one query and creates the missing ones."""
+    # Setup
+    game_id = 1
+    existing_effect = GamePlayerEffect(game_id=game_id, user_id=1, next_win_multiplier=1)
+
+    # Mock exec returning only the record of user 1
+    mock_result = MagicMock()
+    mock_result.all.return_value = [existing_effect]
+    mock_db_session.exec.return_value = mock_result
+
+    # Execute
+    result = get_or_create_players_effects(mock_db_session, game_id, [1, 2, 3])
+
+    # Verify one SELECT for all users
+    mock_db_session.exec.assert_called_once()
+
+    # Verify existing record is reused and the missing ones are created in one batch
+    assert result[1] is existing_effect
+    assert set(result) == {1, 2, 3}
+    mock_db_session.add_all.assert_called_once()
+    created = mock_db_session.add_all.call_args[0][0]
+    assert [effect.user_id for effect in created] == [2, 3]
+    assert all(effect.game_id == game_id and effect.next_win_multiplier == 1 for effect in created)
+    mock_db_session.flush.assert_called_once()
+    mock_db_session.commit.assert_not_called()
+
+
+@pytest.mark.unit
+def test_player_effects_cached_per_session(mock_db_session):
+    """Test effects loaded once in a session are reused without another query."""
+    # Setup: a real dict for session.info, as on a SQLAlchemy session
+    game_id = 1
+    mock_db_session.info = {}
+    effects = [GamePlayerEffect(game_id=game_id, user_id=user_id, next_win_multiplier=1) for user_id in (1, 2)]
+
+    mock_result = MagicMock()
+    mock_result.all.return_value = effects
+    mock_db_session.exec.return_value = mock_result
+
+    # Execute: batched load, then single and batched lookups of the same players
+    get_or_create_players_effects(mock_db_session, game_id, [1, 2])
+    single = get_or_create_player_effects(mock_db_session, game_id, 2)
+    batched = get_or_create_players_effects(mock_db_session, game_id, [1, 2])
+
+    # Verify only the first call hit the database
+    mock_db_session.exec.assert_called_once()
+    assert single is effects[1]
+    assert batched == {1: effects[0], 2: effects[1]}
+
+
+@pytest.mark.unit
+def test_player_effects_cache_reset_on_rollback(db_session):
+    """Test effects created before a rollback are not served from the session cache."""
+    game_id = 1
+    created = get_or_create_players_effects(db_session, game_id, [1])[1]
+
+    db_session.rollback()
+
+    # Verify the rolled-back effect is dropped and a fresh one is loaded
+    reloaded = get_or_create_player_effects(db_session, game_id, 1)
+    assert reloaded is not created
+    assert reloaded in db_session
+
+
 @pytest.mark.unit
 def test_spend_coins_success(mock_db_session):
     """Test spend_coins creates negative transaction."""